@@ -13,12 +13,35 @@ whisper:
   beam_size: 5
   language: "auto"
   condition_on_previous_text: False
+  device: "auto"        # auto / cuda / cpu
+  compute_type: "auto"  # auto / float16 / float32 / int8 / int8_float32 / int8_float16
+  cpu_threads: 0        # 0 = let CTranslate2 decide
+  num_workers: 1        # parallel transcriptions sharing one loaded model
+  shards: 1             # >1: split long audio at quiet points and transcribe the chunks in this many processes (CPU hosts)
+  shard_seconds: 600    # target chunk length; a file is split into at least `shards` chunks
+  shard_overlap: 2.0    # seconds of overlap on each side of a chunk, repeated words are dropped when stitching
+  streaming: True       # start translating while transcription is still running
 
 openai:
   api_key: "your-api-key-here"
   api_base: "https://api.openai.com/v1"
   model: "gpt-4"
   temperature: 0.3
+  # Optional list of OpenAI-compatible endpoints to spread requests over. Each entry
+  # falls back to api_base / api_key / model above and to the RPM/TPM settings in translation.
+  endpoints: []
+  #  - name: "local-a"
+  #    api_base: "http://127.0.0.1:8001/v1"
+  #    api_key: "sk-local"
+  #    model: "qwen2.5-32b"
+  #    weight: 2            # share of requests relative to other endpoints
+  #    max_concurrency: 4   # max requests in flight on this endpoint, 0 = unlimited
+  #    requests_per_minute: 0
+  #    tokens_per_minute: 0
+  # consecutive 5xx / timeout / connection failures before an endpoint is temporarily removed;
+  # the last healthy endpoint is never removed
+  eject_after_failures: 3
+  eject_seconds: 30        # first ejection period, doubled on each failed re-admission
 
 translation:
   prompt: |
@@ -44,12 +67,73 @@ translation:
   example_output: '0|旁白|欢迎观看本节目，让我们开始故事吧！'
   batch_size: 50
   history_size: 500
-  request_interval: 1  # seconds between requests
+  history_mode: sliding  # sliding: history advances every batch; stable: advances in history_step jumps so the
+                         # prompt prefix stays identical between requests and hits the provider's prompt cache
+  history_step: 0        # lines per jump in stable mode, 0 = history_size / 2 (rounded to batch_size)
+  concurrency: 1       # number of batches in flight at the same time (across all endpoints)
+  max_batch_tokens: 0  # token budget of the lines in one batch, 0 = unlimited
+  max_prompt_tokens: 0 # token budget of a whole request, oldest history is trimmed to fit, 0 = unlimited
+  request_interval: 1  # minimum seconds between the start of two requests
+  requests_per_minute: 0  # RPM quota of the API, 0 = unlimited
+  tokens_per_minute: 0    # TPM quota of the API, 0 = unlimited
   max_retries: 5       # max number of retries for translation
-  retry_delay: 5       # seconds to wait before retrying translation
+  retry_delay: 5       # base backoff before retrying, used when the server sends no Retry-After
+  stream: False        # stream replies and abort early when the model drifts off format
+  deduplicate: True    # translate repeated lines (same character and text) only once per file
+  checkpoint: True     # journal finished batches next to the output and resume after a failure
+
+cache:
+  enable: True
+  path: "~/.cache/anime_translator/translations.db"
+  max_entries: 200000  # max cached lines, least recently used are evicted first
+  max_age_days: 30     # cached lines older than this are evicted
+
+probe:
+  cache_path: "~/.cache/anime_translator/probe.json"  # ffprobe results, "" = memory only
+
+audio_cache:  # audio decoded once by ffmpeg to 16 kHz mono float32, memory-mapped for Whisper
+  enable: True
+  path: "~/.cache/anime_translator/audio"
+  max_size_gb: 10      # least recently used files are evicted above this size (~0.23 GB per hour of audio)
+
+transcription_cache:  # Whisper results by audio content and model_size/language/beam_size/condition_on_previous_text
+  enable: True
+  path: "~/.cache/anime_translator/transcriptions.db"
+  max_entries: 2000    # least recently used transcriptions are evicted first
+
+pipeline:  # used with --pipeline
+  extract_workers: 2     # probing / extracting existing subtitles
+  transcribe_workers: 1  # Whisper transcription
+  translate_workers: 2   # files translated at the same time
+  write_workers: 1
+  queue_size: 2          # max jobs waiting between two stages
+
+watch:  # used with --watch DIR [DIR ...]
+  extensions: [".mkv", ".mp4", ".avi", ".webm", ".ts", ".mp3", ".wav", ".flac", ".m4a"]
+  recursive: True
+  settle_seconds: 5  # a file must keep the same size and mtime this long before it is queued
+  poll_interval: 2   # seconds between directory scans when inotify is unavailable
+  use_inotify: True
+  workers: 1         # files processed at the same time
+  max_attempts: 3    # failed files are retried this many times in total
+  retry_delay: 60    # seconds before the first retry, doubled for each further attempt (max 1 hour)
+  queue_path: "~/.cache/anime_translator/watch_queue.db"  # persistent job queue
+
+server:  # used with --serve, requires fastapi and uvicorn
+  host: "127.0.0.1"
+  port: 8080
+  workers: 2         # jobs processed at the same time
+  max_queue: 16      # jobs waiting beyond this are rejected with 429 and Retry-After
+  result_dir: "~/.cache/anime_translator/server"  # uploaded subtitles and their translations
+  max_jobs: 1000     # finished jobs kept for status queries
+
+metrics:
+  report_path: ""  # JSON run report: time, tokens, bytes and retries per stage and per file, "" = disabled
+  trace_path: ""   # Chrome trace of every stage and request (chrome://tracing or ui.perfetto.dev), "" = disabled
 
 output:
   lrc_format: False  # If true, output LRC files; if false, output SRT/ASS files
+  formats: []        # e.g. [srt, ass, vtt]: write all listed formats (srt/ass/lrc/vtt) from one translation, overrides lrc_format
 """
 
 def create_default_config(config_path='config.yml'):
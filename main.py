@@ -2,8 +2,11 @@ import sys
 import yaml
 import argparse
 from processor import SubtitleProcessor
+from pipeline import Pipeline
+from watcher import Watcher
 from pathlib import Path
 from config import create_default_config
+from utils.metrics import metrics
 import glob
 import os
 
@@ -31,21 +34,56 @@ def load_config(config_path=DEFAULT_CONFIG):
 
 def main():
     parser = argparse.ArgumentParser(description="Anime Translator - 自动生成并翻译视频/音频字幕")
-    parser.add_argument("input_files", nargs="+", help="输入音频/视频文件（支持通配符 glob）")
+    parser.add_argument("input_files", nargs="*", help="输入音频/视频文件（支持通配符 glob）；--watch 模式下为要监视的目录")
     parser.add_argument("-e", "--env", help="指定配置文件路径 (默认: 脚本目录下的 config.yml)", default=DEFAULT_CONFIG)
+    parser.add_argument("-p", "--pipeline", action="store_true", help="流水线模式：多个文件的提取、识别、翻译、写入并行进行")
+    parser.add_argument("-w", "--watch", action="store_true", help="常驻模式：监视目录，新文件写入完成后自动处理")
+    parser.add_argument("-s", "--serve", action="store_true", help="HTTP 服务模式：通过 HTTP 接口提交和查询任务（需要 fastapi、uvicorn）")
+    parser.add_argument("--report", help="运行结束后写入 JSON 指标报告（覆盖 metrics.report_path）")
+    parser.add_argument("--trace", help="运行结束后写入 Chrome trace（覆盖 metrics.trace_path）")
 
     args = parser.parse_args()
+    if not args.input_files and not args.serve:
+        parser.error("需要至少一个输入文件或目录")
 
     config = load_config(args.env)
     processor = SubtitleProcessor(config)
-    
+
+    files = []
     for patt in args.input_files:
         result = glob.glob(patt)
         if result:
-            for file in result:
-                processor.process(file)
+            files.extend(result)
         else:
-            processor.process(patt)
+            files.append(patt)
+
+    metrics_config = config.get('metrics') or {}
+    report_path = args.report or metrics_config.get('report_path')
+    trace_path = args.trace or metrics_config.get('trace_path')
+
+    try:
+        if args.serve:
+            # 仅在服务模式下需要 fastapi
+            from server import serve
+            serve(processor, **config.get('server', {}))
+        elif args.watch:
+            watch_config = dict(config.get('watch') or {})
+            queue_path = os.path.expanduser(
+                watch_config.pop('queue_path', '~/.cache/anime_translator/watch_queue.db'))
+            Watcher(processor, files, queue_path, **watch_config).run()
+        elif args.pipeline:
+            Pipeline(processor, **config.get('pipeline', {})).run(files)
+        else:
+            for file in files:
+                processor.process(file)
+    finally:
+        # 工作线程已结束（--watch / --serve 在返回前等待）：写回缓存的最近使用时间并释放数据库
+        processor.close()
+        # 中断时也输出已收集的指标
+        if report_path:
+            metrics.write_report(report_path)
+        if trace_path:
+            metrics.write_chrome_trace(trace_path)
 
 
 if __name__ == "__main__":
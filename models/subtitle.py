@@ -1,5 +1,6 @@
+from array import array
 from dataclasses import dataclass
-from typing import List
+from typing import Dict, Iterable, Iterator, List, Union
 
 @dataclass
 class SubtitleSegment:
@@ -23,3 +24,217 @@ class SubtitleSegment:
 class Subtitle:
     def __init__(self, segments: List[SubtitleSegment]):
         self.segments = segments
+
+
+class _SegmentStore:
+    """按列保存片段：时间为 double 数组，行号和角色编号为 int 数组，角色名去重后只保存一份"""
+
+    __slots__ = ("starts", "ends", "line_numbers", "character_ids", "texts", "characters", "_character_index")
+
+    def __init__(self):
+        self.starts = array("d")
+        self.ends = array("d")
+        self.line_numbers = array("i")
+        self.character_ids = array("I")
+        self.texts: List[str] = []
+        self.characters: List[str] = []
+        self._character_index: Dict[str, int] = {}
+
+    def character_id(self, character: str) -> int:
+        index = self._character_index.get(character)
+        if index is None:
+            index = len(self.characters)
+            self.characters.append(character)
+            self._character_index[character] = index
+        return index
+
+    def append(self, start: float, end: float, text: str, line_number: int, character: str) -> None:
+        # 与 SubtitleSegment.__post_init__ 相同的规范化
+        try:
+            line_number = int(line_number)
+        except ValueError:
+            line_number = 0
+        self.starts.append(start if start > 0 else 0.0)
+        self.ends.append(end if end > 0 else 0.0)
+        self.line_numbers.append(line_number)
+        self.character_ids.append(self.character_id(character))
+        self.texts.append(text)
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+
+class SegmentView:
+    """
+    CompactSubtitle 中一行的视图，属性与 SubtitleSegment 相同，读写直接作用于底层的列。
+    """
+
+    __slots__ = ("_store", "_index")
+
+    def __init__(self, store: _SegmentStore, index: int):
+        self._store = store
+        self._index = index
+
+    @property
+    def start(self) -> float:
+        return self._store.starts[self._index]
+
+    @start.setter
+    def start(self, value: float) -> None:
+        self._store.starts[self._index] = value if value > 0 else 0.0
+
+    @property
+    def end(self) -> float:
+        return self._store.ends[self._index]
+
+    @end.setter
+    def end(self, value: float) -> None:
+        self._store.ends[self._index] = value if value > 0 else 0.0
+
+    @property
+    def text(self) -> str:
+        return self._store.texts[self._index]
+
+    @text.setter
+    def text(self, value: str) -> None:
+        self._store.texts[self._index] = value
+
+    @property
+    def line_number(self) -> int:
+        return self._store.line_numbers[self._index]
+
+    @line_number.setter
+    def line_number(self, value: int) -> None:
+        self._store.line_numbers[self._index] = int(value)
+
+    @property
+    def character(self) -> str:
+        return self._store.characters[self._store.character_ids[self._index]]
+
+    @character.setter
+    def character(self, value: str) -> None:
+        self._store.character_ids[self._index] = self._store.character_id(value)
+
+    def to_segment(self) -> SubtitleSegment:
+        return SubtitleSegment(self.start, self.end, self.text, self.line_number, self.character)
+
+    def _fields(self) -> tuple:
+        return self.start, self.end, self.text, self.line_number, self.character
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, (SegmentView, SubtitleSegment)):
+            return self._fields() == (other.start, other.end, other.text, other.line_number, other.character)
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return "SegmentView(start=%r, end=%r, text=%r, line_number=%r, character=%r)" % self._fields()
+
+
+SegmentLike = Union[SubtitleSegment, SegmentView]
+
+
+class CompactSubtitle:
+    """
+    按列存储的 Subtitle，适合在内存中同时保存大量字幕（整季的字幕、翻译历史等）。
+    每行不再是一个带 __dict__ 的对象，只占数组中的几个元素和文本的引用。
+
+    - 可以像列表一样 len()、迭代和索引，元素为 SegmentView；
+    - 连续切片返回共享底层存储的视图，不复制数据；
+    - 只有原始对象可以 append/extend，已创建的视图范围固定，不受之后追加的影响；
+    - segments 属性返回自身，因此可以代替 Subtitle 传给现有代码。
+    """
+
+    __slots__ = ("_store", "_start", "_stop", "_owner")
+
+    def __init__(self, segments: Iterable[SegmentLike] = ()):
+        self._store = _SegmentStore()
+        self._start = 0
+        self._stop = 0
+        self._owner = True
+        self.extend(segments)
+
+    @classmethod
+    def _view(cls, store: _SegmentStore, start: int, stop: int) -> "CompactSubtitle":
+        view = cls.__new__(cls)
+        view._store = store
+        view._start = start
+        view._stop = stop
+        view._owner = False
+        return view
+
+    @classmethod
+    def from_subtitle(cls, subtitle: Subtitle) -> "CompactSubtitle":
+        return cls(subtitle.segments)
+
+    def to_subtitle(self) -> Subtitle:
+        """转换回由 SubtitleSegment 组成的 Subtitle"""
+        return Subtitle([SubtitleSegment(*row) for row in self.rows()])
+
+    def rows(self) -> Iterator[tuple]:
+        """按行产出 (start, end, text, line_number, character)；批量处理时比逐个访问 SegmentView 的属性快得多"""
+        store = self._store
+        characters = store.characters
+        start, stop = self._start, self._stop
+        return zip(
+            store.starts[start:stop],
+            store.ends[start:stop],
+            store.texts[start:stop],
+            store.line_numbers[start:stop],
+            map(characters.__getitem__, store.character_ids[start:stop]),
+        )
+
+    @property
+    def segments(self) -> "CompactSubtitle":
+        return self
+
+    @property
+    def characters(self) -> List[str]:
+        """角色表（整个底层存储共享）"""
+        return list(self._store.characters)
+
+    def append(self, segment: SegmentLike) -> None:
+        if not self._owner:
+            raise TypeError("Cannot append to a CompactSubtitle view")
+        self._store.append(segment.start, segment.end, segment.text, segment.line_number, segment.character)
+        self._stop += 1
+
+    def extend(self, segments: Iterable[SegmentLike]) -> None:
+        if not self._owner:
+            raise TypeError("Cannot extend a CompactSubtitle view")
+        append = self._store.append
+        for segment in segments:
+            append(segment.start, segment.end, segment.text, segment.line_number, segment.character)
+        self._stop = len(self._store)
+
+    def __len__(self) -> int:
+        return self._stop - self._start
+
+    def __iter__(self) -> Iterator[SegmentView]:
+        store = self._store
+        for index in range(self._start, self._stop):
+            yield SegmentView(store, index)
+
+    def __getitem__(self, key: Union[int, slice]) -> Union[SegmentView, "CompactSubtitle"]:
+        if isinstance(key, slice):
+            start, stop, step = key.indices(len(self))
+            if step == 1:
+                return self._view(self._store, self._start + start, self._start + max(start, stop))
+            # 非连续切片需要复制
+            return CompactSubtitle(self[i] for i in range(start, stop, step))
+        length = len(self)
+        if key < 0:
+            key += length
+        if not 0 <= key < length:
+            raise IndexError("CompactSubtitle index out of range")
+        return SegmentView(self._store, self._start + key)
+
+    def __add__(self, other: Iterable[SegmentLike]) -> "CompactSubtitle":
+        """拼接会复制数据，返回新的 CompactSubtitle"""
+        combined = CompactSubtitle(self)
+        combined.extend(other)
+        return combined
+
+    def __repr__(self) -> str:
+        return f"CompactSubtitle({len(self)} segments)"
@@ -0,0 +1,131 @@
+import os
+import queue
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable, List, Optional
+
+from models.subtitle import Subtitle
+from processor import SubtitleProcessor
+from utils.metrics import metrics
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Job:
+    """流水线中的单个文件任务，所有中间状态都保存在任务上"""
+    path: str
+    sources: list = field(default_factory=list)
+    source: object = None
+    subtitle: Optional[Subtitle] = None
+    translated: Optional[Subtitle] = None
+    started: float = 0.0   # 进入流水线的时间（perf_counter）
+    queued: float = 0.0    # 进入当前阶段队列的时间
+
+
+class Stage:
+    """流水线阶段：若干工作线程从有界队列取任务，处理后交给下游"""
+
+    def __init__(self, name: str, workers: int, queue_size: int, handler: Callable[[Job], None]):
+        self.name = name
+        self.workers = max(1, int(workers))
+        self.queue = queue.Queue(maxsize=max(1, int(queue_size)))
+        self.handler = handler
+        self._threads = []
+
+    def start(self) -> None:
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"{self.name}-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def put(self, job: Job) -> None:
+        job.queued = time.perf_counter()
+        self.queue.put(job)
+
+    def close(self) -> None:
+        """通知所有工作线程退出，并等待队列中剩余任务处理完毕"""
+        for _ in self._threads:
+            self.queue.put(None)
+        for thread in self._threads:
+            thread.join()
+
+    def _run(self) -> None:
+        while True:
+            job = self.queue.get()
+            if job is None:
+                return
+            try:
+                # 记录在队列中等待的时间，用于判断哪个阶段是瓶颈
+                queue_wait = round(time.perf_counter() - job.queued, 3)
+                with metrics.file(job.path), metrics.span(self.name, "pipeline", queue_wait=queue_wait):
+                    self.handler(job)
+            except Exception:
+                logger.exception("Stage %s failed for %s", self.name, job.path)
+
+
+class Pipeline:
+    """
+    跨文件的分阶段流水线：提取 -> 语音识别 -> 翻译 -> 写入。
+    各阶段有独立的工作线程数，阶段之间使用有界队列，
+    因此 Whisper 识别下一集时，上一集可以同时进行翻译。
+    """
+
+    def __init__(
+        self,
+        processor: SubtitleProcessor,
+        extract_workers: int = 2,
+        transcribe_workers: int = 1,
+        translate_workers: int = 2,
+        write_workers: int = 1,
+        queue_size: int = 2,
+    ):
+        self.processor = processor
+        self.extract = Stage("extract", extract_workers, queue_size, self._extract)
+        self.transcribe = Stage("transcribe", transcribe_workers, queue_size, self._transcribe)
+        self.translate = Stage("translate", translate_workers, queue_size, self._translate)
+        self.write = Stage("write", write_workers, queue_size, self._write)
+        self.stages = [self.extract, self.transcribe, self.translate, self.write]
+
+    def run(self, paths: List[str]) -> None:
+        for stage in self.stages:
+            stage.start()
+
+        for path in paths:
+            if not os.path.exists(path):
+                logger.error("File not found: %s", path)
+                continue
+            self.extract.put(Job(path=path, started=time.perf_counter()))
+
+        # 按阶段顺序关闭：上游全部结束后，下游队列不会再有新任务
+        for stage in self.stages:
+            stage.close()
+
+    def _extract(self, job: Job) -> None:
+        logger.info("Processing file: " + job.path)
+        job.sources = self.processor.create_sources()
+        result = self.processor.find_subtitle(job.path, job.sources)
+        if result:
+            job.source, job.subtitle = result
+            self.translate.put(job)
+        else:
+            self.transcribe.put(job)
+
+    def _transcribe(self, job: Job) -> None:
+        job.source, job.subtitle = self.processor.transcribe(job.path, job.sources)
+        self.translate.put(job)
+
+    def _translate(self, job: Job) -> None:
+        if not job.subtitle:
+            logger.error("No subtitle found for %s", job.path)
+            metrics.record("file", job.started, "file", error="no subtitle")
+            return
+        logger.info("Found subtitle with %d lines for %s", len(job.subtitle.segments), job.path)
+        job.translated = self.processor.translate(job.path, job.subtitle.segments)
+        self.write.put(job)
+
+    def _write(self, job: Job) -> None:
+        self.processor.write_output(job.path, job.source, job.translated)
+        metrics.record("file", job.started, "file")
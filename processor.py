@@ -1,16 +1,23 @@
-from typing import List
-from models.subtitle import Subtitle
+from typing import Iterable, List, Optional, Tuple
+from models.subtitle import Subtitle, SubtitleSegment
 from sources.embedded_source import EmbeddedSource
 from sources.srt_source import SRTSource
-from sources.whisper_source import WhisperSource
+from sources.whisper_transcriber import WhisperTranscriber
 from sources.ass.base import ASSource
 from sources.ass.file import ASSFileSource
 from sources.ass.embedded import ASSEmbeddedSource
 from sources.ass.whisper_word import WhisperWord
+from sources.transcription_cache import TranscriptionCache
 from translators.openai_translator import OpenAITranslator
-from utils.srt_utils import write_srt_file
-from utils.ass_util import write_ass_file
-from utils.lrc_utils import write_lrc_file
+from translators.cache import TranslationCache
+from translators.rate_limiter import get_rate_limiter
+from translators.endpoints import Endpoint, EndpointPool
+from utils.audio_cache import AudioCache
+from utils.media_probe import MediaProbe
+from utils.metrics import metrics
+from utils.subtitle_extractor import SubtitleExtractor
+from utils.subtitle_parser import parse_subtitle_file
+from utils.subtitle_writer import OUTPUT_FORMATS, write_subtitles
 import os
 
 
@@ -24,25 +31,84 @@ logging.basicConfig(level=logging.INFO,
 class SubtitleProcessor:
     def __init__(self, config: dict):
         self.config = config
-        self._init_sources()
+        self._init_probe()
+        self._init_audio_cache()
         self._init_translator()
+        self._init_output()
+
+    def _init_probe(self):
+        """所有字幕源共享同一个媒体探测缓存和内嵌字幕提取器"""
+        cache_path = self.config.get('probe', {}).get('cache_path', '')
+        self.probe = MediaProbe(os.path.expanduser(cache_path) if cache_path else None)
+        self.extractor = SubtitleExtractor(self.probe)
     
-    def _init_sources(self):
-        self.sources = [
+    def _init_audio_cache(self):
+        """Whisper 使用的解码音频缓存和识别结果缓存，所有任务共享"""
+        audio_config = self.config.get('audio_cache', {})
+        self.audio_cache = None
+        if audio_config.get('enable', False):
+            self.audio_cache = AudioCache(
+                os.path.expanduser(audio_config.get('path', '~/.cache/anime_translator/audio')),
+                max_bytes=int(audio_config.get('max_size_gb', 10) * 1024 ** 3)
+            )
+        transcription_config = self.config.get('transcription_cache', {})
+        self.transcription_cache = None
+        if transcription_config.get('enable', False):
+            self.transcription_cache = TranscriptionCache(
+                os.path.expanduser(transcription_config.get('path', '~/.cache/anime_translator/transcriptions.db')),
+                max_entries=transcription_config.get('max_entries', 2000)
+            )
+
+    def _init_output(self):
+        """检查输出格式配置，避免翻译完成后才发现格式无效"""
+        for fmt in self.config['output'].get('formats') or []:
+            if str(fmt).lower().lstrip(".") not in OUTPUT_FORMATS:
+                raise ValueError(f"Unsupported output format: {fmt}, expected one of {', '.join(OUTPUT_FORMATS)}")
+
+    def close(self):
+        """提交并关闭翻译缓存和识别结果缓存（CLI、--pipeline、--watch、--serve 退出时调用）"""
+        if self.translator.cache is not None:
+            self.translator.cache.close()
+        if self.transcription_cache is not None:
+            self.transcription_cache.close()
+
+    def create_sources(self) -> list:
+        """创建字幕源。ASS 数据等状态保存在源实例上，因此每个任务使用独立的一组实例"""
+        sources = [
             ASSFileSource(),      # 先尝试外挂ASS
-            ASSEmbeddedSource(),  # 然后尝试内嵌ASS
+            ASSEmbeddedSource(self.extractor),  # 然后尝试内嵌ASS
             SRTSource(),
-            EmbeddedSource()
+            EmbeddedSource(self.extractor)
         ]
 
         if self.config['whisper']['enable']:
-            self.sources.append(WhisperWord(
+            sources.append(WhisperWord(
                 model_size=self.config['whisper']['model_size'],
                 language=self.config['whisper']['language'],
-                beam_size=self.config['whisper']['beam_size']
+                beam_size=self.config['whisper']['beam_size'],
+                device=self.config['whisper'].get('device', 'auto'),
+                compute_type=self.config['whisper'].get('compute_type', 'auto'),
+                cpu_threads=self.config['whisper'].get('cpu_threads', 0),
+                num_workers=self.config['whisper'].get('num_workers', 1),
+                shards=self.config['whisper'].get('shards', 1),
+                shard_seconds=self.config['whisper'].get('shard_seconds', 600),
+                shard_overlap=self.config['whisper'].get('shard_overlap', 2.0),
+                audio_cache=self.audio_cache,
+                condition_on_previous_text=self.config['whisper'].get('condition_on_previous_text', True),
+                transcription_cache=self.transcription_cache
             ))
+        return sources
     
     def _init_translator(self):
+        cache_config = self.config.get('cache', {})
+        cache = None
+        if cache_config.get('enable', False):
+            cache = TranslationCache(
+                path=os.path.expanduser(cache_config.get('path', '~/.cache/anime_translator/translations.db')),
+                max_entries=cache_config.get('max_entries', 200000),
+                max_age_days=cache_config.get('max_age_days', 30)
+            )
+
         self.translator = OpenAITranslator(
             api_key=self.config['openai']['api_key'],
             api_base=self.config['openai']['api_base'],
@@ -53,44 +119,178 @@ class SubtitleProcessor:
             retry_delay=self.config['translation']['retry_delay'],
             batch_size=self.config['translation']['batch_size'],
             history_size=self.config['translation']['history_size'],
+            history_mode=self.config['translation'].get('history_mode', 'sliding'),
+            history_step=self.config['translation'].get('history_step', 0),
             example_input=self.config['translation']['example_input'],
-            example_output=self.config['translation']['example_output']
+            example_output=self.config['translation']['example_output'],
+            cache=cache,
+            concurrency=self.config['translation'].get('concurrency', 1),
+            max_prompt_tokens=self.config['translation'].get('max_prompt_tokens', 0),
+            max_batch_tokens=self.config['translation'].get('max_batch_tokens', 0),
+            endpoints=self._create_endpoints(),
+            stream=self.config['translation'].get('stream', False),
+            deduplicate=self.config['translation'].get('deduplicate', True)
         )
     
-    def process(self, audio_path: str) -> None:
+    def _create_endpoints(self) -> EndpointPool:
+        """根据 openai.endpoints 创建接口池，未配置时使用 api_base / api_key / model 作为唯一接口"""
+        openai_config = self.config['openai']
+        translation_config = self.config['translation']
+        endpoint_configs = openai_config.get('endpoints') or [{}]
+
+        endpoints = []
+        for endpoint_config in endpoint_configs:
+            api_base = endpoint_config.get('api_base', openai_config['api_base'])
+            api_key = endpoint_config.get('api_key', openai_config['api_key'])
+            # 同一接口和密钥的所有请求共享一个限流器
+            rate_limiter = get_rate_limiter(
+                f"{api_base}|{hash(api_key)}",
+                requests_per_minute=endpoint_config.get(
+                    'requests_per_minute', translation_config.get('requests_per_minute', 0)),
+                tokens_per_minute=endpoint_config.get(
+                    'tokens_per_minute', translation_config.get('tokens_per_minute', 0)),
+                min_interval=endpoint_config.get(
+                    'request_interval', translation_config.get('request_interval', 0))
+            )
+            endpoints.append(Endpoint(
+                api_base=api_base,
+                api_key=api_key,
+                model=endpoint_config.get('model', openai_config['model']),
+                weight=endpoint_config.get('weight', 1),
+                max_concurrency=endpoint_config.get('max_concurrency', 0),
+                rate_limiter=rate_limiter,
+                name=endpoint_config.get('name')
+            ))
+
+        return EndpointPool(
+            endpoints,
+            eject_after_failures=openai_config.get('eject_after_failures', 3),
+            eject_seconds=openai_config.get('eject_seconds', 30)
+        )
+
+    def process(self, audio_path: str) -> Optional[str]:
+        """处理一个媒体文件，返回输出字幕的路径；找不到文件或字幕时返回 None"""
         if not os.path.exists(audio_path):
             logger.error("File not found")
-            return
+            return None
+        with metrics.file(audio_path), metrics.span("file", "file"):
+            return self._process(audio_path)
+
+    def _process(self, audio_path: str) -> Optional[str]:
         logger.info("Processing file: "+ audio_path)    
-        result = self._get_subtitle(audio_path)
-        if not result:
+        sources = self.create_sources()
+        result = self.find_subtitle(audio_path, sources)
+        if result is None and self._streaming_enabled(sources[-1]):
+            # 边识别边翻译：凑满一个批次就开始翻译，无需等待识别完成
+            source = sources[-1]
+            logger.info("Streaming transcription into translator")
+            size = os.path.getsize(audio_path)
+            metrics.count(bytes_read=size)
+            segments = metrics.timed_iter(source.iter_segments(audio_path), "transcribe", streaming=True, bytes=size)
+            translated = self.translate(audio_path, segments)
+            return self.write_output(audio_path, source, translated)
+
+        source, subtitle = result or self.transcribe(audio_path, sources)
+        if not subtitle:
             logger.error("No subtitle found for %s", audio_path)
-            return
-        source, subtitle = result
+            return None
         logger.info("Found subtitle with %d lines"%len(subtitle.segments))
-        translated = self.translator.translate(subtitle)
-        if self.config['output']['lrc_format']:
-            write_lrc_file(translated, f"{audio_path}.zh.lrc")
-            logger.info("LRC file successfully written")
-        else:
-            if isinstance(source, ASSource):
-                source.post_processing()
-                write_ass_file(source, translated, f"{audio_path}.zh.ass")
-                logger.info("ASS file successfully written")
+        translated = self.translate(audio_path, subtitle.segments)
+        return self.write_output(audio_path, source, translated)
+
+    def process_subtitle(self, subtitle_path: str, output_base: str) -> Optional[str]:
+        """翻译一个独立的 SRT/ASS 字幕文件，输出写到 output_base 旁（如 output_base.zh.srt）"""
+        with metrics.file(output_base), metrics.span("file", "file"):
+            if os.path.splitext(subtitle_path)[1].lower() in ('.ass', '.ssa'):
+                source = ASSFileSource()
+                subtitle = source.load(subtitle_path)
             else:
-                write_srt_file(translated, f"{audio_path}.zh.srt")
-                logger.info("SRT file successfully written")
-    
-    def _get_subtitle(self, audio_path: str) -> Subtitle:
+                source = SRTSource()
+                subtitle = parse_subtitle_file(subtitle_path)
+            if not subtitle or not subtitle.segments:
+                logger.error("No subtitle lines found in %s", subtitle_path)
+                return None
+            translated = self.translate(output_base, subtitle.segments)
+            return self.write_output(output_base, source, translated)
+
+    def translate(self, audio_path: str, segments: Iterable[SubtitleSegment]) -> Subtitle:
+        """翻译字幕片段；启用断点续传时，进度记录在输出文件旁的日志中"""
+        journal = None
+        if self.config['translation'].get('checkpoint', True):
+            journal = self.translator.create_journal(self._journal_path(audio_path))
+        with metrics.span("translate") as span:
+            translated = self.translator.translate_stream(segments, journal)
+            span["lines"] = len(translated.segments)
+        return translated
+
+    @staticmethod
+    def _journal_path(audio_path: str) -> str:
+        return f"{audio_path}.zh.journal"
+
+    def _streaming_enabled(self, source) -> bool:
+        return self.is_transcriber(source) and self.config['whisper'].get('streaming', True)
+
+    def write_output(self, audio_path: str, source, translated: Subtitle) -> str:
+        with metrics.span("write") as span:
+            output_paths = self._write_output(audio_path, source, translated)
+            span["bytes"] = sum(os.path.getsize(path) for path in output_paths)
+
+        # 输出完成后断点日志不再需要
+        journal_path = self._journal_path(audio_path)
+        if os.path.exists(journal_path):
+            os.remove(journal_path)
+        return output_paths[0]
+
+    def output_formats(self, source) -> List[str]:
+        """输出格式：output.formats 未配置时，LRC 或与字幕源相同的 ASS/SRT"""
+        formats = self.config['output'].get('formats') or []
+        if formats:
+            return [str(fmt).lower().lstrip(".") for fmt in formats]
+        if self.config['output']['lrc_format']:
+            return ["lrc"]
+        return ["ass"] if isinstance(source, ASSource) else ["srt"]
+
+    def _write_output(self, audio_path: str, source, translated: Subtitle) -> List[str]:
+        """遍历一次译文生成所有输出格式，逐个原子写入，返回输出文件路径（第一个为主输出）"""
+        formats = self.output_formats(source)
+        if "ass" in formats and isinstance(source, ASSource):
+            source.post_processing()
+        paths = write_subtitles(translated, f"{audio_path}.zh", formats, source)
+        logger.info(f"Subtitles written: {', '.join(paths.values())}")
+        return list(paths.values())
+
+    @staticmethod
+    def is_transcriber(source) -> bool:
+        """是否为语音识别字幕源"""
+        return isinstance(source, WhisperTranscriber)
+
+    def find_subtitle(self, audio_path: str, sources: list) -> Optional[Tuple[object, Subtitle]]:
+        """依次尝试已有字幕（外挂/内嵌），不进行语音识别；找不到时返回 None"""
         if self.config['common']['ignore_subtitles']:
-            return self.sources[-1], self.sources[-1].get_subtitle(audio_path)
-        
-        for source in self.sources:
+            return None
+
+        for source in sources:
+            if self.is_transcriber(source):
+                continue
             try:
                 logger.info("Try source: "+ str(source.__class__.__name__))
-                sub =  source.get_subtitle(audio_path)
+                with metrics.span("source", "source", source=source.__class__.__name__) as span:
+                    sub =  source.get_subtitle(audio_path)
+                    span["lines"] = len(sub.segments) if sub else 0
                 if sub:
                     return source, sub
             except Exception:
                 continue
-        return self.sources[-1], self.sources[-1].get_subtitle(audio_path)
\ No newline at end of file
+        return None
+
+    def transcribe(self, audio_path: str, sources: list) -> Tuple[object, Subtitle]:
+        """使用最后一个字幕源（启用 Whisper 时为语音识别）生成字幕"""
+        with metrics.span("transcribe", bytes=os.path.getsize(audio_path)) as span:
+            subtitle = sources[-1].get_subtitle(audio_path)
+            span["lines"] = len(subtitle.segments) if subtitle else 0
+        metrics.count(bytes_read=span["bytes"])
+        return sources[-1], subtitle
+
+    def _get_subtitle(self, audio_path: str, sources: Optional[list] = None) -> Tuple[object, Subtitle]:
+        sources = sources or self.create_sources()
+        return self.find_subtitle(audio_path, sources) or self.transcribe(audio_path, sources)
@@ -0,0 +1,263 @@
+import asyncio
+import glob
+import json
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List, Optional
+
+import uvicorn
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from pydantic import BaseModel
+
+from processor import SubtitleProcessor
+from utils.metrics import metrics
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ServiceJob:
+    """一个 HTTP 任务：翻译服务器上的媒体文件，或翻译上传的字幕"""
+    id: str
+    kind: str                      # media / subtitle
+    path: str                      # 媒体文件路径，或上传字幕保存的路径
+    status: str = "queued"         # queued / running / done / failed
+    output: Optional[str] = None   # 输出字幕路径
+    error: Optional[str] = None
+    created: float = field(default_factory=time.time)
+    started: Optional[float] = None
+    finished: Optional[float] = None
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+class JobService:
+    """
+    常驻的任务服务：一个 SubtitleProcessor（Whisper 模型、客户端和限流器）由所有请求共享。
+    任务进入有界队列，由固定数量的工作线程处理；队列已满时拒绝新任务（背压）。
+    """
+
+    def __init__(
+        self,
+        processor: SubtitleProcessor,
+        workers: int = 2,
+        max_queue: int = 16,
+        result_dir: str = "~/.cache/anime_translator/server",
+        max_jobs: int = 1000,
+    ):
+        self.processor = processor
+        self.workers = max(1, int(workers))
+        self.result_dir = os.path.expanduser(result_dir)
+        self.max_jobs = max_jobs
+        os.makedirs(self.result_dir, exist_ok=True)
+
+        self.queue = queue.Queue(maxsize=max(1, int(max_queue)))
+        self.jobs: "OrderedDict[str, ServiceJob]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._threads: List[threading.Thread] = []
+
+    def start(self) -> None:
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker, name=f"server-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self) -> None:
+        for _ in self._threads:
+            self.queue.put(None)
+        for thread in self._threads:
+            thread.join()
+
+    def submit(self, kind: str, path: str) -> Optional[ServiceJob]:
+        """提交任务；队列已满时返回 None"""
+        job = ServiceJob(id=uuid.uuid4().hex, kind=kind, path=path)
+        with self._lock:
+            try:
+                self.queue.put_nowait(job)
+            except queue.Full:
+                return None
+            self.jobs[job.id] = job
+            pruned = self._prune()
+        for old in pruned:
+            self._remove_files(old)
+        return job
+
+    def submit_subtitle(self, content: str, subtitle_format: str) -> Optional[ServiceJob]:
+        """保存上传的字幕并提交任务；输出写在同一目录下"""
+        if self.queue.full():
+            return None
+        path = os.path.join(self.result_dir, f"{uuid.uuid4().hex}.{subtitle_format}")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(content)
+        job = self.submit("subtitle", path)
+        if job is None:
+            os.remove(path)
+        return job
+
+    def _prune(self) -> List[ServiceJob]:
+        """只保留最近 max_jobs 个已结束的任务，返回被移除的任务"""
+        finished = [job_id for job_id, job in self.jobs.items() if job.finished is not None]
+        return [self.jobs.pop(job_id) for job_id in finished[:max(0, len(self.jobs) - self.max_jobs)]]
+
+    @staticmethod
+    def _remove_files(job: ServiceJob) -> None:
+        """删除上传的字幕及其所有输出（{名称}.zh.*）；媒体任务的文件不属于服务，保留"""
+        if job.kind != "subtitle":
+            return
+        base = os.path.splitext(job.path)[0]
+        for path in [job.path] + glob.glob(f"{glob.escape(base)}.zh.*"):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.warning(f"Cannot remove {path}: {e}")
+
+    def get(self, job_id: str) -> Optional[ServiceJob]:
+        with self._lock:
+            return self.jobs.get(job_id)
+
+    def _worker(self) -> None:
+        while True:
+            job = self.queue.get()
+            if job is None:
+                return
+            with self._lock:
+                job.started = time.time()
+                job.status = "running"
+            status = "failed"
+            try:
+                if job.kind == "subtitle":
+                    output = self.processor.process_subtitle(job.path, os.path.splitext(job.path)[0])
+                else:
+                    output = self.processor.process(job.path)
+                if output is None:
+                    raise RuntimeError("No subtitle found")
+                job.output = output
+                status = "done"
+            except Exception as e:
+                logger.exception(f"Job {job.id} failed: {job.path}")
+                job.error = str(e)
+            finally:
+                # 先写 finished 再写终态，观察到终态时其余字段已完整
+                with self._lock:
+                    job.finished = time.time()
+                    job.status = status
+
+    def status(self) -> dict:
+        with self._lock:
+            counts: Dict[str, int] = {}
+            for job in self.jobs.values():
+                counts[job.status] = counts.get(job.status, 0) + 1
+        return {
+            "workers": self.workers,
+            "queue_depth": self.queue.qsize(),
+            "queue_capacity": self.queue.maxsize,
+            "jobs": counts,
+            "translation": self.processor.translator.stats.as_dict(),
+        }
+
+
+class MediaJobRequest(BaseModel):
+    path: str
+
+
+class SubtitleJobRequest(BaseModel):
+    content: str
+    format: str = "srt"  # srt / vtt / ass / ssa
+
+
+def create_app(service: JobService) -> FastAPI:
+    app = FastAPI(title="Anime Translator")
+
+    def accepted(job: Optional[ServiceJob]) -> JSONResponse:
+        if job is None:
+            # 背压：队列已满，请客户端稍后重试
+            return JSONResponse(
+                status_code=429,
+                headers={"retry-after": "5"},
+                content={"error": "queue full", "queue_depth": service.queue.qsize()},
+            )
+        return JSONResponse(status_code=202, content=job.to_dict())
+
+    def find(job_id: str) -> ServiceJob:
+        job = service.get(job_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail="Job not found")
+        return job
+
+    @app.post("/jobs")
+    def submit_media(request: MediaJobRequest):
+        if not os.path.isfile(request.path):
+            raise HTTPException(status_code=400, detail=f"File not found: {request.path}")
+        return accepted(service.submit("media", os.path.abspath(request.path)))
+
+    @app.post("/jobs/subtitle")
+    def submit_subtitle(request: SubtitleJobRequest):
+        subtitle_format = request.format.lower().lstrip(".")
+        if subtitle_format not in ("srt", "vtt", "ass", "ssa"):
+            raise HTTPException(status_code=400, detail=f"Unsupported subtitle format: {request.format}")
+        return accepted(service.submit_subtitle(request.content, subtitle_format))
+
+    @app.get("/jobs/{job_id}")
+    def get_job(job_id: str):
+        return find(job_id).to_dict()
+
+    @app.get("/jobs/{job_id}/result")
+    def get_result(job_id: str):
+        job = find(job_id)
+        if job.status != "done":
+            raise HTTPException(status_code=409, detail=f"Job is {job.status}")
+        with open(job.output, "r", encoding="utf-8") as f:
+            return PlainTextResponse(f.read())
+
+    @app.get("/jobs/{job_id}/events")
+    async def job_events(job_id: str):
+        """以 SSE 推送任务状态变化，结束时附带译文"""
+        job = find(job_id)
+
+        async def events():
+            last = None
+            while True:
+                status = job.status
+                if status != last:
+                    last = status
+                    data = job.to_dict()
+                    if status == "done":
+                        with open(job.output, "r", encoding="utf-8") as f:
+                            data["result"] = f.read()
+                    yield f"data: {json.dumps(data, ensure_ascii=False)}\n\n"
+                # 终态只推送一次
+                if status in ("done", "failed"):
+                    return
+                await asyncio.sleep(0.5)
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    @app.get("/status")
+    def get_status():
+        return service.status()
+
+    @app.get("/metrics")
+    def get_metrics():
+        return metrics.report()
+
+    return app
+
+
+def serve(processor: SubtitleProcessor, host: str = "127.0.0.1", port: int = 8080, **options) -> None:
+    """启动 HTTP 服务，阻塞直到退出"""
+    service = JobService(processor, **options)
+    service.start()
+    try:
+        uvicorn.run(create_app(service), host=host, port=port)
+    finally:
+        service.stop()
@@ -20,25 +20,29 @@ class ASSFileSource(ASSource):
         ]
         return [p for p in candidates if p.exists()]
     
+    def load(self, ass_path) -> Subtitle:
+        """读取一个ASS/SSA文件，保留原始数据用于写回"""
+        self.original_ass = pysubs2.load(str(ass_path))
+        self.ass_path = ass_path
+        
+        segments = [
+            SubtitleSegment(
+                line_number=i+1,
+                start=event.start / 1000,  # 毫秒转秒
+                end=event.end / 1000,
+                text=event.text,
+                character=event.name
+            )
+            for i, event in enumerate(self.original_ass.events)
+            if event.type == "Dialogue"
+        ]
+        return Subtitle(segments)
+    
     def get_subtitle(self, video_path: str) -> Subtitle:
         video_path = Path(video_path)
         for ass_path in self.find_ass_files(video_path):
             try:
-                self.original_ass = pysubs2.load(str(ass_path))
-                self.ass_path = ass_path
-                
-                segments = [
-                    SubtitleSegment(
-                        line_number=i+1,
-                        start=event.start / 1000,  # 毫秒转秒
-                        end=event.end / 1000,
-                        text=event.text,
-                        character=event.name
-                    )
-                    for i, event in enumerate(self.original_ass.events)
-                    if event.type == "Dialogue"
-                ]
-                return Subtitle(segments)
+                return self.load(ass_path)
             except Exception:
                 continue
         return None
\ No newline at end of file
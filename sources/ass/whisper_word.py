@@ -1,25 +1,17 @@
 from models.subtitle import Subtitle, SubtitleSegment
 from .base import ASSource
+from ..whisper_transcriber import WhisperTranscriber
 import pysubs2
 import logging
 
 logger = logging.getLogger(__name__)
 
-class WhisperWord(ASSource):
-    def __init__(self, model_size: str, language: str, beam_size: int = 5):
-        self.model_size = model_size
-        self.language = language
-        self.beam_size = beam_size
-
-    def _load_model(self):
-        from faster_whisper import WhisperModel
-        import torch
-        device = 'cuda' if torch.cuda.is_available() else 'cpu'
-        compute_type = 'float16' if torch.cuda.is_available() else 'float32'
-        self.model = WhisperModel(self.model_size, device, compute_type=compute_type)
-
+class WhisperWord(WhisperTranscriber, ASSource):
     def get_subtitle(self, video_path):
-        self._load_model()
+        return Subtitle(list(self.iter_segments(video_path)))
+
+    def iter_segments(self, video_path):
+        """边识别边产生字幕片段，ASS 数据随之构建，识别结束后保存原文 ASS"""
         self.original_ass = pysubs2.SSAFile()
         # 添加一个样式
         style = pysubs2.SSAStyle()
@@ -49,25 +41,9 @@ class WhisperWord(ASSource):
         small_style.alignment = pysubs2.Alignment.TOP_CENTER
         self.original_ass.styles[small_style.name] = small_style
 
-        if self.language == 'auto':
-            segments, _ = self.model.transcribe(
-                video_path,
-                beam_size=self.beam_size,
-                word_timestamps=True
-            )
-        else:
-            segments, _ = self.model.transcribe(
-                video_path,
-                language=self.language,
-                beam_size=self.beam_size,
-                word_timestamps=True
-            )
-
-        subtitle_segments = []
         self.original_sub = []
 
-
-        for i, segment in enumerate(segments):
+        for i, segment in enumerate(self.transcribe_segments(video_path)):
             text = []
             lastend = segment.start
             for word in segment.words:
@@ -82,13 +58,6 @@ class WhisperWord(ASSource):
                 lastend = end
 
             line = "".join(text)
-            subtitle_segments.append(SubtitleSegment(
-                start=segment.start,
-                end=segment.end,
-                text=segment.text,
-                line_number=i+1,  # Whisper生成的行号从1开始
-                character="Transcription"
-            ))
             event = pysubs2.SSAEvent(
                 start=segment.start*1000, 
                 end=segment.end*1000, text=segment.text, style="Default")
@@ -97,10 +66,14 @@ class WhisperWord(ASSource):
                 end=segment.end*1000, text=line, style="Karaoke-Small")
             self.original_ass.events.append(event)
             self.original_sub.append(event2)
-            if i % 10 == 0:
-                logger.info(f'Transcribe at {segment.start}, content: {segment.text}')
+            yield SubtitleSegment(
+                start=segment.start,
+                end=segment.end,
+                text=segment.text,
+                line_number=i+1,  # Whisper生成的行号从1开始
+                character="Transcription"
+            )
         self.original_ass.save(video_path+".original."+self.language+".ass")
-        return Subtitle(subtitle_segments)
     
     def post_processing(self):
         self.original_ass.extend(self.original_sub)
\ No newline at end of file
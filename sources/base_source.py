@@ -1,8 +1,15 @@
 from abc import ABC, abstractmethod
-from models.subtitle import Subtitle
+from typing import Iterator
+from models.subtitle import Subtitle, SubtitleSegment
 
 class BaseSubtitleSource(ABC):
     @abstractmethod
     def get_subtitle(self, audio_path: str) -> Subtitle:
         """从给定音频/视频路径获取字幕"""
-        pass
\ No newline at end of file
+        pass
+
+    def iter_segments(self, audio_path: str) -> Iterator[SubtitleSegment]:
+        """逐条产生字幕片段，默认一次性获取整个字幕；支持流式输出的源可覆盖此方法"""
+        subtitle = self.get_subtitle(audio_path)
+        if subtitle:
+            yield from subtitle.segments
\ No newline at end of file
@@ -0,0 +1,238 @@
+import atexit
+import math
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+
+import numpy as np
+
+from .whisper_models import Segment, Word, detect_device, get_whisper_model
+from utils.audio_cache import SAMPLING_RATE, AudioCache
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 计算能量的帧长（秒）
+FRAME_SECONDS = 0.1
+# 每个分片至少这么长，过短的音频不分片
+MIN_CHUNK_SECONDS = 60
+# 自动检测语言时使用的开头音频长度
+LANGUAGE_DETECTION_SECONDS = 30
+
+# 模型参数：(model_size, device, compute_type, cpu_threads)
+ModelArgs = Tuple[str, str, str, int]
+# 分片音频：数组，或 (PCM 缓存文件, 起始样本, 结束样本)，后者由工作进程自行内存映射，不经过管道传输
+ChunkAudio = Union[np.ndarray, Tuple[str, int, int]]
+
+
+# 进程池按模型参数和进程数缓存，跨文件复用，工作进程中的模型只加载一次
+_pools: Dict[Tuple[ModelArgs, int], ProcessPoolExecutor] = {}
+_pools_lock = threading.Lock()
+
+
+def _init_worker(model_args: ModelArgs) -> None:
+    """工作进程启动时预先加载模型"""
+    _load_model(model_args)
+
+
+def _load_model(model_args: ModelArgs):
+    model_size, device, compute_type, cpu_threads = model_args
+    return get_whisper_model(model_size, device=device, compute_type=compute_type, cpu_threads=cpu_threads)
+
+
+def _detect_language(model_args: ModelArgs, audio: np.ndarray) -> Optional[str]:
+    model = _load_model(model_args)
+    try:
+        language, _, _ = model.detect_language(audio)
+    except AttributeError:
+        # 旧版 faster-whisper 没有 detect_language，改为识别一小段
+        _, info = model.transcribe(audio)
+        language = info.language
+    return language
+
+
+def _transcribe_chunk(model_args: ModelArgs, audio: ChunkAudio, offset: float, options: dict) -> List[tuple]:
+    """识别一个分片，返回已加上偏移的 (start, end, text, [(start, end, word), ...])"""
+    if isinstance(audio, tuple):
+        pcm_path, start, end = audio
+        audio = AudioCache.open(pcm_path)[start:end]
+    model = _load_model(model_args)
+    segments, _ = model.transcribe(audio, word_timestamps=True, **options)
+    return [
+        (
+            segment.start + offset,
+            segment.end + offset,
+            segment.text,
+            [(word.start + offset, word.end + offset, word.word) for word in segment.words or []],
+        )
+        for segment in segments
+    ]
+
+
+def _get_pool(model_args: ModelArgs, workers: int) -> ProcessPoolExecutor:
+    key = (model_args, workers)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            logger.info(f"Starting {workers} Whisper worker processes ({model_args[0]}, {model_args[3]} threads each)")
+            # spawn：不继承父进程中的线程和已加载的库状态
+            pool = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(model_args,),
+            )
+            _pools[key] = pool
+        return pool
+
+
+def shutdown_pools() -> None:
+    """关闭所有工作进程"""
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+atexit.register(shutdown_pools)
+
+
+def find_split_points(audio: np.ndarray, num_chunks: int, search_seconds: float = 30.0,
+                      sampling_rate: int = SAMPLING_RATE) -> List[int]:
+    """
+    把音频大致均分为 num_chunks 段，每个切分点在目标位置前后 search_seconds 内
+    选择能量最低的帧（通常是台词之间的停顿）。返回包含 0 和 len(audio) 的样本下标列表。
+    """
+    frame = int(FRAME_SECONDS * sampling_rate)
+    search = int(search_seconds * sampling_rate)
+    points = [0]
+    for i in range(1, num_chunks):
+        target = len(audio) * i // num_chunks
+        low = max(points[-1] + frame, target - search)
+        high = min(len(audio), target + search)
+        frames = (high - low) // frame
+        if frames <= 0:
+            points.append(target)
+            continue
+        window = audio[low:low + frames * frame].reshape(frames, frame)
+        energy = np.einsum("ij,ij->i", window, window)
+        points.append(low + int(np.argmin(energy)) * frame + frame // 2)
+    points.append(len(audio))
+    return points
+
+
+def _normalize_word(word: str) -> str:
+    return word.strip().strip(".,!?;:。、，！？…").lower()
+
+
+def _own_segments(raw: List[tuple], own_start: float, own_end: float,
+                  previous: Optional[Word], tolerance: float) -> List[Segment]:
+    """
+    只保留中点落在本分片负责区间 [own_start, own_end) 内的词，按词重建片段。
+    分片开头与上一分片最后一个词重复（文本相同且时间重叠）的词被丢弃。
+    """
+    segments = []
+    for start, end, text, raw_words in raw:
+        if not raw_words:
+            if own_start <= (start + end) / 2 < own_end:
+                segments.append(Segment(start, end, text))
+            continue
+        words = []
+        for word_start, word_end, word in raw_words:
+            if not own_start <= (word_start + word_end) / 2 < own_end:
+                continue
+            if (
+                previous is not None
+                and word_start < previous.end + tolerance
+                and _normalize_word(word) == _normalize_word(previous.word)
+            ):
+                continue
+            words.append(Word(word_start, word_end, word))
+            previous = None  # 只检查分片开头的词
+        if not words:
+            continue
+        if len(words) == len(raw_words):
+            segments.append(Segment(start, end, text, words))
+        else:
+            segments.append(Segment(words[0].start, words[-1].end, "".join(w.word for w in words), words))
+    return segments
+
+
+def transcribe_sharded(
+    audio_path: str,
+    model_size: str,
+    workers: int,
+    language: Optional[str] = None,
+    beam_size: int = 5,
+    device: str = "auto",
+    compute_type: str = "auto",
+    cpu_threads: int = 0,
+    shard_seconds: float = 600,
+    overlap_seconds: float = 2.0,
+    audio_cache: Optional[AudioCache] = None,
+    condition_on_previous_text: bool = True,
+) -> Iterator[Segment]:
+    """
+    分片并行识别：在低能量处切分音频，各分片前后重叠 overlap_seconds，
+    由进程池中的工作进程（各自持有一个模型）识别，再按时间顺序拼接。
+    时间戳换算回整段音频，重叠区的词只保留一次，因此逐词的卡拉 OK 时间依然对齐。
+    language 为 None 时先检测一次语言，所有分片使用相同的语言。
+    提供 audio_cache 时音频从 PCM 缓存内存映射，工作进程直接读取缓存文件。
+    """
+    pcm_path = None
+    if audio_cache is not None:
+        try:
+            pcm_path = audio_cache.ensure(audio_path)
+        except Exception as e:
+            logger.warning(f"Audio cache unavailable for {audio_path}: {e}")
+    if pcm_path is not None:
+        audio = AudioCache.open(pcm_path)
+    else:
+        from faster_whisper import decode_audio
+        audio = decode_audio(audio_path, sampling_rate=SAMPLING_RATE)
+    duration = len(audio) / SAMPLING_RATE
+    num_chunks = max(workers, math.ceil(duration / shard_seconds))
+    num_chunks = max(1, min(num_chunks, int(duration // MIN_CHUNK_SECONDS)))
+
+    device, compute_type = detect_device(device, compute_type)
+    if not cpu_threads:
+        cpu_threads = max(1, (multiprocessing.cpu_count() or 1) // workers)
+    model_args = (model_size, device, compute_type, cpu_threads)
+    pool = _get_pool(model_args, workers)
+
+    if language is None:
+        head = np.array(audio[:LANGUAGE_DETECTION_SECONDS * SAMPLING_RATE])
+        language = pool.submit(_detect_language, model_args, head).result()
+        logger.info(f"Detected language: {language}")
+    options = {"beam_size": beam_size, "condition_on_previous_text": condition_on_previous_text}
+    if language:
+        options["language"] = language
+
+    points = find_split_points(audio, num_chunks)
+    overlap = int(overlap_seconds * SAMPLING_RATE)
+    logger.info(f"Transcribing {duration:.0f}s of audio in {num_chunks} chunks on {workers} processes")
+
+    futures = []
+    for i in range(num_chunks):
+        start = max(0, points[i] - overlap)
+        end = min(len(audio), points[i + 1] + overlap)
+        chunk = (pcm_path, start, end) if pcm_path is not None else audio[start:end]
+        futures.append(pool.submit(_transcribe_chunk, model_args, chunk, start / SAMPLING_RATE, options))
+    del audio
+
+    previous = None
+    try:
+        for i, future in enumerate(futures):
+            own_start = points[i] / SAMPLING_RATE if i > 0 else float("-inf")
+            own_end = points[i + 1] / SAMPLING_RATE if i < num_chunks - 1 else float("inf")
+            segments = _own_segments(future.result(), own_start, own_end, previous, overlap_seconds)
+            for segment in segments:
+                yield segment
+            if segments and segments[-1].words:
+                previous = segments[-1].words[-1]
+    finally:
+        for future in futures:
+            future.cancel()
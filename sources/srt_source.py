@@ -1,7 +1,7 @@
 import os
-from models.subtitle import Subtitle, SubtitleSegment
+from models.subtitle import Subtitle
 from .base_source import BaseSubtitleSource
-from utils.time_utils import srt_time_to_seconds
+from utils.subtitle_parser import parse_subtitle_file
 from typing import Optional
 
 class SRTSource(BaseSubtitleSource):
@@ -10,7 +10,9 @@ class SRTSource(BaseSubtitleSource):
         possible_paths = [
             f"{base_path}.en.srt",
             f"{base_path}.srt",
-            f"{audio_path}.en.srt"
+            f"{audio_path}.en.srt",
+            f"{base_path}.en.vtt",
+            f"{base_path}.vtt"
         ]
         
         for path in possible_paths:
@@ -19,35 +21,5 @@ class SRTSource(BaseSubtitleSource):
         return None
     
     def _parse_srt(self, srt_path: str) -> Subtitle:
-        segments = []
-        current_segment = None
-        line_counter = 1  # SRT文件的行号从1开始
-        
-        with open(srt_path, 'r', encoding='utf-8') as f:
-            for line in f:
-                line = line.strip()
-                
-                if not line:
-                    if current_segment and current_segment.text:
-                        current_segment.line_number = line_counter
-                        segments.append(current_segment)
-                        line_counter += 1
-                        current_segment = None
-                    continue
-                    
-                if ' --> ' in line:
-                    start_str, end_str = line.split(' --> ')
-                    current_segment = SubtitleSegment(
-                        start=srt_time_to_seconds(start_str),
-                        end=srt_time_to_seconds(end_str),
-                        text='',
-                        line_number=0  # 临时值，后面会设置
-                    )
-                elif current_segment and not line.isdigit():
-                    current_segment.text += (' ' + line) if current_segment.text else line
-        
-        if current_segment and current_segment.text:
-            current_segment.line_number = line_counter
-            segments.append(current_segment)
-        
-        return Subtitle(segments)
\ No newline at end of file
+        """解析SRT/WebVTT文件"""
+        return parse_subtitle_file(srt_path)
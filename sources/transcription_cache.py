@@ -0,0 +1,125 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Iterable, List, Optional
+
+from utils.audio_cache import content_fingerprint
+from utils.metrics import metrics
+from .whisper_models import Segment, Word
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class TranscriptionCache:
+    """
+    基于 SQLite 的语音识别结果缓存。
+    键为 (音频内容指纹, model_size, language, beam_size, condition_on_previous_text) 的哈希，
+    值为压缩后的片段及逐词时间戳（卡拉 OK 字幕需要）。命中时无需加载模型。
+    按条目数以最近使用时间淘汰。
+    """
+
+    def __init__(self, path: str, max_entries: int = 2000):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS transcriptions ("
+            " key TEXT PRIMARY KEY,"
+            " segments BLOB NOT NULL,"
+            " created REAL NOT NULL,"
+            " last_used REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_transcriptions_last_used ON transcriptions(last_used)"
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(
+        fingerprint: str,
+        model_size: str,
+        language: str,
+        beam_size: int,
+        condition_on_previous_text: bool,
+    ) -> str:
+        h = hashlib.sha256()
+        for part in (fingerprint, model_size, language, str(int(beam_size)), str(bool(condition_on_previous_text))):
+            h.update(part.encode("utf-8"))
+            h.update(b"\0")
+        return h.hexdigest()
+
+    def key_for(self, media_path: str, model_size: str, language: str, beam_size: int,
+                condition_on_previous_text: bool) -> Optional[str]:
+        """计算媒体文件的缓存键，文件无法读取时返回 None"""
+        try:
+            fingerprint = content_fingerprint(media_path)
+        except OSError as e:
+            logger.warning(f"Cannot fingerprint {media_path}: {e}")
+            return None
+        return self.make_key(fingerprint, model_size, language, beam_size, condition_on_previous_text)
+
+    def get(self, key: str) -> Optional[List[Segment]]:
+        """返回缓存的片段，未命中返回 None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT segments FROM transcriptions WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                metrics.count(transcription_cache_misses=1)
+                return None
+            self._conn.execute("UPDATE transcriptions SET last_used = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+            self.hits += 1
+        metrics.count(transcription_cache_hits=1)
+        return [
+            Segment(start, end, text, [Word(*word) for word in words])
+            for start, end, text, words in json.loads(zlib.decompress(row[0]))
+        ]
+
+    def put(self, key: str, segments: Iterable) -> None:
+        """保存识别结果；segments 为 faster-whisper 或分片识别的片段（带 words）"""
+        data = [
+            [segment.start, segment.end, segment.text,
+             [[word.start, word.end, word.word] for word in segment.words or []]]
+            for segment in segments
+        ]
+        blob = zlib.compress(json.dumps(data, ensure_ascii=False).encode("utf-8"))
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO transcriptions (key, segments, created, last_used) VALUES (?, ?, ?, ?)",
+                (key, blob, now, now),
+            )
+            self._conn.commit()
+        self.evict()
+
+    def evict(self) -> None:
+        """按最近使用时间裁剪到 max_entries"""
+        if not self.max_entries:
+            return
+        with self._lock:
+            count = self._conn.execute("SELECT COUNT(*) FROM transcriptions").fetchone()[0]
+            if count > self.max_entries:
+                self._conn.execute(
+                    "DELETE FROM transcriptions WHERE key IN ("
+                    " SELECT key FROM transcriptions ORDER BY last_used ASC LIMIT ?)",
+                    (count - self.max_entries,),
+                )
+                self._conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
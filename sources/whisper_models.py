@@ -0,0 +1,90 @@
+import threading
+from dataclasses import dataclass, field
+from typing import List, Tuple
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Word:
+    start: float
+    end: float
+    word: str
+
+
+@dataclass
+class Segment:
+    """与 faster-whisper 的 Segment 属性相同（start / end / text / words），可直接替换"""
+    start: float
+    end: float
+    text: str
+    words: List[Word] = field(default_factory=list)
+
+
+# 进程内共享的 Whisper 模型：(model_size, device, compute_type) -> WhisperModel
+_models = {}
+_lock = threading.Lock()
+_key_locks = {}
+
+
+def detect_device(device: str = "auto", compute_type: str = "auto") -> Tuple[str, str]:
+    """
+    解析设备和计算精度。
+    通过 ctranslate2（faster-whisper 的依赖）检测 CUDA，无需导入 torch。
+    """
+    if device == "auto":
+        try:
+            import ctranslate2
+            device = "cuda" if ctranslate2.get_cuda_device_count() > 0 else "cpu"
+        except Exception:
+            device = "cpu"
+    if compute_type == "auto":
+        compute_type = "float16" if device == "cuda" else "float32"
+    return device, compute_type
+
+
+def get_whisper_model(
+    model_size: str,
+    device: str = "auto",
+    compute_type: str = "auto",
+    cpu_threads: int = 0,
+    num_workers: int = 1,
+):
+    """
+    获取（必要时懒加载）共享的 WhisperModel。
+    同一进程内相同 (model_size, device, compute_type) 的模型只加载一次，跨文件复用。
+    cpu_threads / num_workers 只在首次加载时生效。
+    """
+    device, compute_type = detect_device(device, compute_type)
+    key = (model_size, device, compute_type)
+
+    with _lock:
+        model = _models.get(key)
+        if model is not None:
+            return model
+        key_lock = _key_locks.setdefault(key, threading.Lock())
+
+    # 每个 key 单独加锁，避免多个线程重复加载同一个模型
+    with key_lock:
+        model = _models.get(key)
+        if model is None:
+            from faster_whisper import WhisperModel
+            logger.info(f"Loading Whisper model {model_size} on {device} ({compute_type})")
+            model = WhisperModel(
+                model_size,
+                device,
+                compute_type=compute_type,
+                cpu_threads=cpu_threads,
+                num_workers=num_workers,
+            )
+            with _lock:
+                _models[key] = model
+        return model
+
+
+def clear_whisper_models() -> None:
+    """释放所有已加载的模型"""
+    with _lock:
+        _models.clear()
@@ -0,0 +1,128 @@
+from typing import Iterator, Optional
+
+from .transcription_cache import TranscriptionCache
+from .whisper_models import get_whisper_model
+from utils.audio_cache import AudioCache
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class WhisperTranscriber:
+    """
+    Whisper 识别字幕源的公共部分（WhisperSource 与 WhisperWord 共用）：
+    模型参数、共享模型的加载、多进程分片识别、音频缓存和识别结果缓存。
+    子类只负责把识别出的片段转换为字幕。
+    """
+
+    def __init__(
+        self,
+        model_size: str,
+        language: str,
+        beam_size: int = 5,
+        device: str = "auto",
+        compute_type: str = "auto",
+        cpu_threads: int = 0,
+        num_workers: int = 1,
+        shards: int = 1,
+        shard_seconds: float = 600,
+        shard_overlap: float = 2.0,
+        audio_cache: Optional[AudioCache] = None,
+        condition_on_previous_text: bool = True,
+        transcription_cache: Optional[TranscriptionCache] = None,
+    ):
+        self.model_size = model_size
+        self.language = language
+        self.beam_size = beam_size
+        self.device = device
+        self.compute_type = compute_type
+        self.cpu_threads = cpu_threads
+        self.num_workers = num_workers
+        self.shards = shards
+        self.shard_seconds = shard_seconds
+        self.shard_overlap = shard_overlap
+        self.audio_cache = audio_cache
+        self.condition_on_previous_text = condition_on_previous_text
+        self.transcription_cache = transcription_cache
+
+    def _load_model(self):
+        self.model = get_whisper_model(
+            self.model_size,
+            device=self.device,
+            compute_type=self.compute_type,
+            cpu_threads=self.cpu_threads,
+            num_workers=self.num_workers
+        )
+
+    def _transcribe_sharded(self, audio_path: str):
+        """多进程分片识别（shards > 1 时使用），各工作进程持有自己的模型"""
+        from .sharded_whisper import transcribe_sharded
+        return transcribe_sharded(
+            audio_path,
+            self.model_size,
+            workers=self.shards,
+            language=None if self.language == 'auto' else self.language,
+            beam_size=self.beam_size,
+            device=self.device,
+            compute_type=self.compute_type,
+            cpu_threads=self.cpu_threads,
+            shard_seconds=self.shard_seconds,
+            overlap_seconds=self.shard_overlap,
+            audio_cache=self.audio_cache,
+            condition_on_previous_text=self.condition_on_previous_text,
+        )
+
+    def _audio_input(self, audio_path: str):
+        """启用音频缓存时返回内存映射的 PCM 数组，否则（或解码失败时）返回路径，由 faster-whisper 自行解码"""
+        if self.audio_cache is None:
+            return audio_path
+        try:
+            return self.audio_cache.load(audio_path)
+        except Exception as e:
+            logger.warning(f"Audio cache unavailable for {audio_path}: {e}")
+            return audio_path
+
+    def _transcribe(self, audio_path: str):
+        """单进程识别；language 为 auto 时由模型自动检测"""
+        self._load_model()
+        options = {} if self.language == 'auto' else {"language": self.language}
+        segments, _ = self.model.transcribe(
+            self._audio_input(audio_path),
+            beam_size=self.beam_size,
+            condition_on_previous_text=self.condition_on_previous_text,
+            word_timestamps=True,
+            **options
+        )
+        return segments
+
+    def transcribe_segments(self, audio_path: str) -> Iterator:
+        """
+        逐个产生识别出的 Whisper 片段（带逐词时间）。
+        识别结果缓存命中时直接回放，不加载模型；完整识别结束后写入缓存。
+        """
+        cache_key = None
+        if self.transcription_cache is not None:
+            cache_key = self.transcription_cache.key_for(
+                audio_path, self.model_size, self.language, self.beam_size, self.condition_on_previous_text
+            )
+            cached = self.transcription_cache.get(cache_key) if cache_key is not None else None
+            if cached is not None:
+                logger.info(f"Using cached transcription for {audio_path}")
+                yield from cached
+                return
+
+        if self.shards > 1:
+            segments = self._transcribe_sharded(audio_path)
+        else:
+            segments = self._transcribe(audio_path)
+
+        transcribed = []
+        for i, segment in enumerate(segments):
+            if cache_key is not None:
+                transcribed.append(segment)
+            if i % 10 == 0:
+                logger.info(f'Transcribe at {segment.start}, content: {segment.text}')
+            yield segment
+        if cache_key is not None:
+            self.transcription_cache.put(cache_key, transcribed)
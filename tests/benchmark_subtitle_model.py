@@ -0,0 +1,134 @@
+"""
+字幕模型基准：对比 Subtitle（SubtitleSegment 列表）与按列存储的 CompactSubtitle 的内存占用和常用操作耗时。
+
+示例：
+    python tests/benchmark_subtitle_model.py --lines 300000
+"""
+import argparse
+import gc
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.subtitle import CompactSubtitle, Subtitle, SubtitleSegment
+from translators.history import TranslationHistory
+from utils.text_format import segments_to_text
+
+CHARACTERS = ["Alice", "Bob", "Misaka", "Narrator", "default"]
+
+
+def make_rows(lines: int, seed: int) -> list:
+    """生成 (start, end, text, line_number, character)；文本各不相同，与真实字幕一样不会被共享"""
+    rng = random.Random(seed)
+    rows = []
+    for i in range(lines):
+        start = i * 2.5
+        text = f"Line {i}: " + " ".join(rng.choice(["hello", "world", "magic", "school"]) for _ in range(6))
+        rows.append((start, start + rng.uniform(0.5, 2.4), text, i + 1, rng.choice(CHARACTERS)))
+    return rows
+
+
+def build_list(rows: list) -> Subtitle:
+    return Subtitle([SubtitleSegment(*row) for row in rows])
+
+
+def build_compact(rows: list) -> CompactSubtitle:
+    return CompactSubtitle(SubtitleSegment(*row) for row in rows)
+
+
+def measure_memory(build, rows: list) -> tuple:
+    """返回 (构建耗时, 字幕本身占用的字节数)；文本字符串在两种模型间共享，不计入"""
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    subtitle = build(rows)
+    elapsed = time.perf_counter() - started
+    gc.collect()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, size, subtitle
+
+
+def timed(function, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def history_snapshots(subtitle, batch_size: int, compact: bool) -> None:
+    """模拟翻译循环：逐批写入历史，每批前获取快照并取出最近的上下文"""
+    example = SubtitleSegment(0, 0, "example", 0)
+    if compact:
+        history = TranslationHistory(example, example)
+    else:
+        orig, trans = [example], [example]
+    segments = subtitle.segments
+    for i in range(0, len(segments), batch_size):
+        batch = segments[i:i + batch_size]
+        if compact:
+            snapshot = history.snapshot()
+            segments_to_text(snapshot[0][-batch_size:])
+            history.extend(batch, batch)
+        else:
+            snapshot = list(orig), list(trans)
+            segments_to_text(snapshot[0][-batch_size:])
+            orig.extend(batch)
+            trans.extend(batch)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Subtitle / CompactSubtitle 基准")
+    parser.add_argument("--lines", type=int, default=300000)
+    parser.add_argument("--batch-size", type=int, default=30)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rows = make_rows(args.lines, args.seed)
+    list_build, list_bytes, as_list = measure_memory(build_list, rows)
+    compact_build, compact_bytes, compact = measure_memory(build_compact, rows)
+
+    assert [(s.start, s.end, s.text, s.line_number, s.character) for s in as_list.segments] == \
+        [(s.start, s.end, s.text, s.line_number, s.character) for s in compact]
+
+    print(f"{args.lines} lines")
+    print(f"{'':>22} {'list':>10} {'compact':>10}")
+    print(f"{'memory (MiB)':>22} {list_bytes / 2**20:>10.1f} {compact_bytes / 2**20:>10.1f}")
+    print(f"{'bytes per line':>22} {list_bytes / args.lines:>10.0f} {compact_bytes / args.lines:>10.0f}")
+    print(f"{'build (s)':>22} {list_build:>10.3f} {compact_build:>10.3f}")
+
+    def iterate(subtitle):
+        return lambda: sum(seg.end - seg.start for seg in subtitle.segments)
+
+    def batches(subtitle):
+        segments = subtitle.segments
+        return lambda: [segments[i:i + args.batch_size] for i in range(0, len(segments), args.batch_size)]
+
+    cases = [
+        ("iterate (s)", iterate(as_list), iterate(compact)),
+        ("iterate rows() (s)", iterate(as_list), lambda: sum(row[1] - row[0] for row in compact.rows())),
+        ("slice batches (s)", batches(as_list), batches(compact)),
+    ]
+    for name, list_case, compact_case in cases:
+        print(f"{name:>22} {timed(list_case, args.repeat):>10.3f} {timed(compact_case, args.repeat):>10.3f}")
+
+    # 历史快照的复制开销随行数平方增长，使用较少的行
+    history_lines = min(args.lines, 30000)
+    list_history = Subtitle(as_list.segments[:history_lines])
+    compact_history = compact[:history_lines]
+    print(
+        f"{'history x%d (s)' % history_lines:>22} "
+        f"{timed(lambda: history_snapshots(list_history, args.batch_size, False), 1):>10.3f} "
+        f"{timed(lambda: history_snapshots(compact_history, args.batch_size, True), 1):>10.3f}"
+    )
+
+
+if __name__ == "__main__":
+    main()
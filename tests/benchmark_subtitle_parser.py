@@ -0,0 +1,123 @@
+"""
+字幕解析基准：对比原先逐行解析的 SRT 解析器与 utils.subtitle_parser。
+
+示例：
+    python tests/benchmark_subtitle_parser.py --cues 100000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.subtitle import Subtitle, SubtitleSegment
+from utils.subtitle_parser import parse_subtitle_file
+from utils.time_utils import srt_time_to_seconds
+
+
+def legacy_parse_srt(srt_path: str) -> Subtitle:
+    """原 SRTSource._parse_srt 的实现，用作对照"""
+    segments = []
+    current_segment = None
+    line_counter = 1
+
+    with open(srt_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+
+            if not line:
+                if current_segment and current_segment.text:
+                    current_segment.line_number = line_counter
+                    segments.append(current_segment)
+                    line_counter += 1
+                    current_segment = None
+                continue
+
+            if ' --> ' in line:
+                start_str, end_str = line.split(' --> ')
+                current_segment = SubtitleSegment(
+                    start=srt_time_to_seconds(start_str),
+                    end=srt_time_to_seconds(end_str),
+                    text='',
+                    line_number=0
+                )
+            elif current_segment and not line.isdigit():
+                current_segment.text += (' ' + line) if current_segment.text else line
+
+    if current_segment and current_segment.text:
+        current_segment.line_number = line_counter
+        segments.append(current_segment)
+
+    return Subtitle(segments)
+
+
+def timestamp(seconds: float, separator: str) -> str:
+    ms = int(round(seconds * 1000))
+    return f"{ms // 3600000:02}:{ms // 60000 % 60:02}:{ms // 1000 % 60:02}{separator}{ms % 1000:03}"
+
+
+def make_file(cues: int, vtt: bool = False, crlf: bool = False, bom: bool = False) -> str:
+    newline = "\r\n" if crlf else "\n"
+    separator = "." if vtt else ","
+    parts = ["WEBVTT", ""] if vtt else []
+    for i in range(cues):
+        start = i * 2.5
+        parts.append(str(i + 1))
+        parts.append(f"{timestamp(start, separator)} --> {timestamp(start + 2, separator)}")
+        parts.append(f"Line {i} of the subtitle, with <i>some</i> markup")
+        if i % 3 == 0:
+            parts.append("and a second line")
+        parts.append("")
+    data = newline.join(parts).encode("utf-8")
+    if bom:
+        data = b"\xef\xbb\xbf" + data
+    fd, path = tempfile.mkstemp(suffix=".vtt" if vtt else ".srt")
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    return path
+
+
+def measure(parse, path: str, repeat: int):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = parse(path)
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SRT/WebVTT 解析基准")
+    parser.add_argument("--cues", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    cases = [
+        ("srt", {}),
+        ("srt crlf+bom", {"crlf": True, "bom": True}),
+        ("vtt", {"vtt": True}),
+    ]
+    for name, options in cases:
+        path = make_file(args.cues, **options)
+        try:
+            new_time, new = measure(parse_subtitle_file, path, args.repeat)
+            try:
+                old_time, old = measure(legacy_parse_srt, path, args.repeat)
+                old_cues = len(old.segments)
+            except Exception as e:
+                old_time, old, old_cues = None, None, f"error: {type(e).__name__}"
+            print(f"{name:>14}: new {new_time:.3f}s ({len(new.segments)} cues)", end="")
+            if old_time is not None:
+                same = [(s.start, s.end, s.text) for s in old.segments] == [(s.start, s.end, s.text) for s in new.segments]
+                print(f", old {old_time:.3f}s ({old_cues} cues), speedup {old_time / new_time:.1f}x, identical: {same}")
+            else:
+                print(f", old {old_cues}")
+        finally:
+            os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
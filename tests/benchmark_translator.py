@@ -0,0 +1,136 @@
+"""
+离线翻译吞吐基准：在本进程内启动模拟服务器，用合成字幕驱动 OpenAITranslator。
+
+示例：
+    python tests/benchmark_translator.py --lines 2000 --concurrency 4 --latency 0.5 --drop 0.02 --error-429 0.05
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import mock_openai_server
+from models.subtitle import Subtitle, SubtitleSegment
+from translators.endpoints import Endpoint, EndpointPool
+from translators.openai_translator import OpenAITranslator
+from translators.rate_limiter import RateLimiter
+
+WORDS = [
+    "はい", "そうですね", "ちょっと待って", "本当に", "ありがとう", "大丈夫", "行こう",
+    "何をしているの", "あの", "ええ", "まさか", "魔法", "学校", "明日", "先生", "友達",
+]
+CHARACTERS = ["Alice", "Bob", "Misaka", "Narrator", ""]
+
+
+def make_subtitle(lines: int, repeat_rate: float, seed: int) -> Subtitle:
+    """生成合成字幕：长度随机的台词，按 repeat_rate 重复之前出现过的行"""
+    rng = random.Random(seed)
+    segments = []
+    for i in range(lines):
+        if segments and rng.random() < repeat_rate:
+            previous = rng.choice(segments)
+            text, character = previous.text, previous.character
+        else:
+            text = "、".join(rng.choice(WORDS) for _ in range(rng.randint(1, 8)))
+            character = rng.choice(CHARACTERS)
+        segments.append(SubtitleSegment(
+            start=i * 2.0, end=i * 2.0 + 1.5, text=text, line_number=i + 1, character=character
+        ))
+    return Subtitle(segments)
+
+
+def run(args: argparse.Namespace) -> dict:
+    mock_openai_server.configure_from_args(args)
+    mock_openai_server.config.quiet = True
+    ports = [args.port + i if args.port else mock_openai_server.free_port() for i in range(args.endpoints)]
+    servers = [mock_openai_server.start_server(port) for port in ports]
+    # 每个模拟服务器作为一个接口，共享同一套故障配置
+    endpoints = EndpointPool([
+        Endpoint(
+            f"http://127.0.0.1:{port}/v1", "benchmark", "mock",
+            max_concurrency=args.endpoint_concurrency,
+            rate_limiter=RateLimiter(args.rpm, args.tpm),
+            name=f"mock:{port}",
+        )
+        for port in ports
+    ])
+
+    translator = OpenAITranslator(
+        api_key="benchmark",
+        api_base=f"http://127.0.0.1:{ports[0]}/v1",
+        model="mock",
+        prompt="translate",
+        max_retries=args.max_retries,
+        retry_delay=args.retry_delay,
+        batch_size=args.batch_size,
+        history_size=args.history_size,
+        history_mode=args.history_mode,
+        history_step=args.history_step,
+        concurrency=args.concurrency,
+        max_batch_tokens=args.max_batch_tokens,
+        max_prompt_tokens=args.max_prompt_tokens,
+        endpoints=endpoints,
+        stream=args.stream,
+        deduplicate=not args.no_dedup,
+    )
+    subtitle = make_subtitle(args.lines, args.repeat_rate, args.seed or 0)
+
+    started = time.perf_counter()
+    translated = translator.translate(subtitle)
+    elapsed = time.perf_counter() - started
+    for server in servers:
+        server.should_exit = True
+
+    stats = translator.stats.as_dict()
+    return {
+        "lines": len(subtitle.segments),
+        "translated_lines": len(translated.segments),
+        "seconds": round(elapsed, 3),
+        "lines_per_second": round(len(subtitle.segments) / elapsed, 1) if elapsed else 0.0,
+        **stats,
+        "prompt_cache_hit_rate": round(stats["cached_tokens"] / stats["prompt_tokens"], 3) if stats["prompt_tokens"] else 0.0,
+        "latency_p50": round(translator.stats.latency_percentile(50), 3),
+        "latency_p95": round(translator.stats.latency_percentile(95), 3),
+        "endpoints": endpoints.summary(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OpenAITranslator 离线吞吐基准")
+    parser.add_argument("--lines", type=int, default=1000, help="合成字幕行数")
+    parser.add_argument("--repeat-rate", type=float, default=0.0, help="重复行的比例")
+    parser.add_argument("--batch-size", type=int, default=50)
+    parser.add_argument("--history-size", type=int, default=500)
+    parser.add_argument("--history-mode", choices=["sliding", "stable"], default="sliding")
+    parser.add_argument("--history-step", type=int, default=0)
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--max-batch-tokens", type=int, default=0)
+    parser.add_argument("--max-prompt-tokens", type=int, default=0)
+    parser.add_argument("--max-retries", type=int, default=5)
+    parser.add_argument("--retry-delay", type=float, default=0.1)
+    parser.add_argument("--rpm", type=float, default=0)
+    parser.add_argument("--tpm", type=float, default=0)
+    parser.add_argument("--stream", action="store_true")
+    parser.add_argument("--no-dedup", action="store_true")
+    parser.add_argument("--endpoints", type=int, default=1, help="启动的模拟服务器（接口）数量")
+    parser.add_argument("--endpoint-concurrency", type=int, default=0, help="每个接口的并发上限")
+    parser.add_argument("--port", type=int, default=0, help="第一个服务器的端口，其余依次递增")
+    parser.add_argument("--json", action="store_true", help="以 JSON 输出结果")
+    mock_openai_server.add_arguments(parser)
+    args = parser.parse_args()
+
+    result = run(args)
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        for name, value in result.items():
+            print(f"{name:>22}: {value}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+分片识别基准：同一文件分别用单进程和多进程分片识别，比较耗时、片段数和逐词一致性。
+需要 faster-whisper 和本地模型。
+
+示例：
+    python tests/benchmark_whisper_shards.py episode.mkv --model small --shards 8 --language ja
+"""
+import argparse
+import difflib
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sources.sharded_whisper import shutdown_pools, transcribe_sharded
+from sources.whisper_models import get_whisper_model
+
+
+def words_of(segments) -> list:
+    return [(round(word.start, 2), word.word.strip()) for segment in segments for word in segment.words or []]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Whisper 分片识别基准")
+    parser.add_argument("path")
+    parser.add_argument("--model", default="small")
+    parser.add_argument("--shards", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--shard-seconds", type=float, default=600)
+    parser.add_argument("--overlap", type=float, default=2.0)
+    parser.add_argument("--language", default=None)
+    parser.add_argument("--cpu-threads", type=int, default=0, help="单进程识别的线程数，0 = 全部核心")
+    parser.add_argument("--skip-single", action="store_true", help="只运行分片识别")
+    args = parser.parse_args()
+
+    single = None
+    if not args.skip_single:
+        model = get_whisper_model(args.model, device="cpu", cpu_threads=args.cpu_threads or os.cpu_count() or 0)
+        started = time.perf_counter()
+        segments, _ = model.transcribe(args.path, language=args.language, word_timestamps=True)
+        single = list(segments)
+        single_time = time.perf_counter() - started
+        print(f"single process: {single_time:.1f}s, {len(single)} segments")
+
+    started = time.perf_counter()
+    sharded = list(transcribe_sharded(
+        args.path,
+        args.model,
+        workers=args.shards,
+        language=args.language,
+        device="cpu",
+        shard_seconds=args.shard_seconds,
+        overlap_seconds=args.overlap,
+    ))
+    sharded_time = time.perf_counter() - started
+    print(f"{args.shards} shards: {sharded_time:.1f}s (including worker start-up), {len(sharded)} segments")
+    shutdown_pools()
+
+    if single is not None:
+        matcher = difflib.SequenceMatcher(
+            a=[word for _, word in words_of(single)],
+            b=[word for _, word in words_of(sharded)],
+            autojunk=False,
+        )
+        print(f"speedup: {single_time / sharded_time:.2f}x, word agreement: {matcher.ratio():.1%}")
+
+    starts = [start for start, _ in words_of(sharded)]
+    print(f"word timestamps monotonic: {all(a <= b for a, b in zip(starts, starts[1:]))}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+测试共用的夹具：在本进程内启动的模拟 OpenAI 服务器，以及连接到它的 OpenAITranslator。
+"""
+import os
+import sys
+from dataclasses import asdict
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# test_mock_client*.py 是手动运行的脚本（导入时即向 localhost:8000 发送请求），不作为测试收集
+collect_ignore = ["test_mock_client.py", "test_mock_client_multi.py"]
+
+
+@pytest.fixture(scope="session")
+def mock_server():
+    """整个测试会话共用一个模拟服务器；缺少 fastapi/uvicorn/openai 时跳过依赖它的测试"""
+    pytest.importorskip("openai")
+    pytest.importorskip("fastapi")
+    pytest.importorskip("uvicorn")
+    import mock_openai_server
+
+    port = mock_openai_server.free_port()
+    server = mock_openai_server.start_server(port)
+    yield f"http://127.0.0.1:{port}/v1"
+    server.should_exit = True
+
+
+@pytest.fixture
+def mock_config(mock_server):
+    """每个测试使用固定的随机种子，测试中可直接修改故障注入配置，结束后恢复默认"""
+    import mock_openai_server
+
+    mock_openai_server.configure(quiet=True, seed=7)
+    yield mock_openai_server.config
+    mock_openai_server.configure(**asdict(mock_openai_server.MockConfig()))
+
+
+@pytest.fixture
+def make_translator(mock_server, mock_config):
+    """返回创建 OpenAITranslator 的函数，默认连接模拟服务器且重试不等待"""
+    from translators.openai_translator import OpenAITranslator
+
+    def factory(**options):
+        options = {"retry_delay": 0, "batch_size": 10, "max_retries": 3, "prompt": "translate", **options}
+        return OpenAITranslator(api_key="test", api_base=mock_server, model="mock", **options)
+
+    return factory
+
+
+@pytest.fixture
+def make_segments():
+    """返回生成 count 行测试字幕的函数：第 i 行为 "line i"，角色 Alice，间隔 2 秒"""
+    from models.subtitle import SubtitleSegment
+
+    def factory(count: int):
+        return [
+            SubtitleSegment(start=i * 2.0, end=i * 2.0 + 1.5, text=f"line {i}", line_number=i, character="Alice")
+            for i in range(1, count + 1)
+        ]
+
+    return factory
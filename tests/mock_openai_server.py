@@ -1,11 +1,104 @@
 from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel
+from collections import deque
+from dataclasses import dataclass
 from typing import List, Optional
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import socket
+import sys
+import threading
 import uvicorn
 import time
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.tokens import estimate_messages_tokens, estimate_tokens
+
 app = FastAPI()
 
+
+@dataclass
+class MockConfig:
+    """模拟服务器行为：延迟分布与故障注入（概率均为 0~1）"""
+    latency: float = 0.0            # 平均延迟（秒）
+    latency_dist: str = "fixed"     # fixed / uniform / lognormal
+    latency_sigma: float = 0.5      # uniform 的相对抖动，或 lognormal 的 sigma
+    error_429_rate: float = 0.0
+    error_500_rate: float = 0.0
+    retry_after: float = 1.0        # 429 返回的 Retry-After（秒）
+    drop_rate: float = 0.0          # 每行被丢弃的概率
+    reorder_rate: float = 0.0       # 回复行被打乱顺序的概率
+    malformed_rate: float = 0.0     # 每行被替换为格式错误文本的概率
+    truncated_rate: float = 0.0     # 每行被截断为只剩 "行号|角色" 的概率
+    seed: Optional[int] = None
+    quiet: bool = False             # 不打印每个请求的行号
+    prompt_cache: bool = False      # 模拟服务端前缀缓存，在 usage 中返回 cached_tokens
+    cache_min_tokens: int = 1024    # 前缀至少这么长才会被缓存
+    cache_block_tokens: int = 128   # 缓存的 token 数按块向下取整
+
+
+config = MockConfig()
+rng = random.Random()
+# 最近请求的消息列表，用于模拟前缀缓存
+recent_prompts = deque(maxlen=64)
+
+
+def configure(**kwargs) -> MockConfig:
+    """修改模拟服务器配置（基准测试在同一进程中调用）"""
+    for name, value in kwargs.items():
+        setattr(config, name, value)
+    rng.seed(config.seed)
+    return config
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(port: int) -> uvicorn.Server:
+    """在后台线程中启动模拟服务器（基准测试和 pytest 在同一进程中使用）"""
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="error"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+def cached_prefix_tokens(messages: List[dict]) -> int:
+    """与最近的请求比较，返回逐条相同的最长消息前缀的 token 数（按块向下取整）"""
+    best = 0
+    for previous in recent_prompts:
+        common = 0
+        while common < min(len(previous), len(messages)) and previous[common] == messages[common]:
+            common += 1
+        best = max(best, common)
+    recent_prompts.append(messages)
+    tokens = estimate_messages_tokens(messages[:best]) if best else 0
+    if tokens < config.cache_min_tokens:
+        return 0
+    return tokens // config.cache_block_tokens * config.cache_block_tokens
+
+
+def sample_latency() -> float:
+    if config.latency <= 0:
+        return 0.0
+    if config.latency_dist == "uniform":
+        spread = config.latency * config.latency_sigma
+        return max(0.0, rng.uniform(config.latency - spread, config.latency + spread))
+    if config.latency_dist == "lognormal":
+        # 使均值等于 latency
+        mu = math.log(config.latency) - config.latency_sigma ** 2 / 2
+        return rng.lognormvariate(mu, config.latency_sigma)
+    return config.latency
+
+
 class Message(BaseModel):
     role: str
     content: str
@@ -14,6 +107,7 @@ class ChatCompletionRequest(BaseModel):
     model: str
     messages: List[Message]
     temperature: Optional[float] = 0.5
+    stream: Optional[bool] = False
 
 
 def compress_num_list(num_list):
@@ -44,10 +138,49 @@ def compress_num_list(num_list):
     
     return ", ".join(builder)
 
+
+def inject_line_faults(translated_lines: List[str]) -> List[str]:
+    """按配置丢弃、损坏或打乱回复中的行"""
+    result = []
+    for line in translated_lines:
+        roll = rng.random()
+        if roll < config.drop_rate:
+            continue
+        if roll < config.drop_rate + config.malformed_rate:
+            result.append(line.split("|", 2)[-1])
+            continue
+        if roll < config.drop_rate + config.malformed_rate + config.truncated_rate:
+            result.append("|".join(line.split("|", 2)[:2]))
+            continue
+        result.append(line)
+    if len(result) > 1 and rng.random() < config.reorder_rate:
+        rng.shuffle(result)
+    return result
+
+
+def error_response(status_code: int, message: str, error_type: str, headers: Optional[dict] = None):
+    return JSONResponse(
+        status_code=status_code,
+        headers=headers,
+        content={"error": {"message": message, "type": error_type, "param": None, "code": None}},
+    )
+
+
 @app.post("/v1/chat/completions")
 async def chat_completions(request: ChatCompletionRequest):
     if not request.messages:
         raise HTTPException(status_code=400, detail="Messages list is empty")
+
+    await asyncio.sleep(sample_latency())
+
+    roll = rng.random()
+    if roll < config.error_429_rate:
+        return error_response(
+            429, "Rate limit reached", "rate_limit_error",
+            headers={"retry-after": str(config.retry_after)},
+        )
+    if roll < config.error_429_rate + config.error_500_rate:
+        return error_response(500, "Internal server error", "server_error")
     
     # 获取最后一条用户消息
     last_message = request.messages[-1].content
@@ -57,19 +190,20 @@ async def chat_completions(request: ChatCompletionRequest):
     translated_lines = []
 
     # 遍历并打印每条消息的 role 和压缩行号
-    for message in request.messages:
-        msg_line_numbers = []
-        for line in message.content.split("\n"):
-            line = line.strip()
-            if not line:
-                continue
-            parts = line.split("|")
-            if parts and parts[0].isdigit():
-                msg_line_numbers.append(int(parts[0]))
+    if not config.quiet:
+        for message in request.messages:
+            msg_line_numbers = []
+            for line in message.content.split("\n"):
+                line = line.strip()
+                if not line:
+                    continue
+                parts = line.split("|")
+                if parts and parts[0].isdigit():
+                    msg_line_numbers.append(int(parts[0]))
         
-        compressed = compress_num_list(msg_line_numbers)
-        print(f"Role: {message.role}, Lines: {compressed}")
-    print("-" * 20)
+            compressed = compress_num_list(msg_line_numbers)
+            print(f"Role: {message.role}, Lines: {compressed}")
+        print("-" * 20)
 
     for line in lines:
         line = line.strip()
@@ -95,7 +229,24 @@ async def chat_completions(request: ChatCompletionRequest):
         # 返回格式: line_number|character|[line_number] text
         translated_lines.append(f"{line_num}|{character}|{line_num}-{text}")
 
-    response_content = "\n".join(translated_lines)
+    response_content = "\n".join(inject_line_faults(translated_lines))
+
+    messages = [m.model_dump() for m in request.messages]
+    prompt_tokens = estimate_messages_tokens(messages)
+    completion_tokens = estimate_tokens(response_content)
+    usage = {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens
+    }
+    if config.prompt_cache:
+        usage["prompt_tokens_details"] = {"cached_tokens": cached_prefix_tokens(messages)}
+
+    if request.stream:
+        return StreamingResponse(
+            stream_chunks(request.model, response_content, usage),
+            media_type="text/event-stream",
+        )
     
     # 模拟 OpenAI 响应结构
     return {
@@ -113,12 +264,63 @@ async def chat_completions(request: ChatCompletionRequest):
                 "finish_reason": "stop"
             }
         ],
-        "usage": {
-            "prompt_tokens": 0,
-            "completion_tokens": 0,
-            "total_tokens": 0
-        }
+        "usage": usage
     }
 
+
+async def stream_chunks(model: str, content: str, usage: dict, chunk_size: int = 16):
+    """以 SSE 形式分块返回回复，最后一块携带 usage"""
+    created = int(time.time())
+    base = {"id": f"chatcmpl-{created}", "object": "chat.completion.chunk", "created": created, "model": model}
+    for i in range(0, len(content), chunk_size):
+        chunk = dict(base, choices=[{"index": 0, "delta": {"content": content[i:i + chunk_size]}, "finish_reason": None}])
+        yield f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n"
+    yield f"data: {json.dumps(dict(base, choices=[{'index': 0, 'delta': {}, 'finish_reason': 'stop'}]))}\n\n"
+    yield f"data: {json.dumps(dict(base, choices=[], usage=usage))}\n\n"
+    yield "data: [DONE]\n\n"
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--latency", type=float, default=0.0, help="平均延迟（秒）")
+    parser.add_argument("--latency-dist", choices=["fixed", "uniform", "lognormal"], default="fixed")
+    parser.add_argument("--latency-sigma", type=float, default=0.5)
+    parser.add_argument("--error-429", type=float, default=0.0, help="返回 429 的概率")
+    parser.add_argument("--error-500", type=float, default=0.0, help="返回 500 的概率")
+    parser.add_argument("--retry-after", type=float, default=1.0)
+    parser.add_argument("--drop", type=float, default=0.0, help="每行被丢弃的概率")
+    parser.add_argument("--reorder", type=float, default=0.0, help="回复被打乱顺序的概率")
+    parser.add_argument("--malformed", type=float, default=0.0, help="每行格式损坏的概率")
+    parser.add_argument("--truncated", type=float, default=0.0, help="每行被截断为只剩一个分隔符的概率")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--quiet", action="store_true")
+    parser.add_argument("--prompt-cache", action="store_true", help="模拟服务端前缀缓存")
+    parser.add_argument("--cache-min-tokens", type=int, default=1024)
+
+
+def configure_from_args(args: argparse.Namespace) -> MockConfig:
+    return configure(
+        latency=args.latency,
+        latency_dist=args.latency_dist,
+        latency_sigma=args.latency_sigma,
+        error_429_rate=args.error_429,
+        error_500_rate=args.error_500,
+        retry_after=args.retry_after,
+        drop_rate=args.drop,
+        reorder_rate=args.reorder,
+        malformed_rate=args.malformed,
+        truncated_rate=args.truncated,
+        seed=args.seed,
+        quiet=args.quiet,
+        prompt_cache=args.prompt_cache,
+        cache_min_tokens=args.cache_min_tokens,
+    )
+
+
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    parser = argparse.ArgumentParser(description="OpenAI 兼容的本地模拟服务器")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    add_arguments(parser)
+    args = parser.parse_args()
+    configure_from_args(args)
+    uvicorn.run(app, host=args.host, port=args.port)
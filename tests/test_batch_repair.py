@@ -0,0 +1,56 @@
+"""
+批次补翻与二分的回归测试（在本进程内启动模拟服务器）：
+回复中丢行、格式损坏、截断或乱序时只补翻缺失的行，仍然失败时二分批次。
+
+运行：
+    python -m pytest tests/test_batch_repair.py
+"""
+import pytest
+
+from models.subtitle import SubtitleSegment
+from utils.text_format import text_to_segments
+
+
+def expected(segments):
+    """模拟服务器把 n|角色|文本 译为 n|角色|n-文本"""
+    return [(seg.line_number, seg.start, seg.end, f"{seg.line_number}-{seg.text}") for seg in segments]
+
+
+def rows(segments):
+    return [(seg.line_number, seg.start, seg.end, seg.text) for seg in segments]
+
+
+def test_text_to_segments_skips_lines_missing_fields():
+    original = [SubtitleSegment(start=1.0, end=2.0, text="a", line_number=1, character="Alice"),
+                SubtitleSegment(start=3.0, end=4.0, text="b", line_number=2, character="Alice")]
+    # 只剩一个分隔符的行不应使整个回复作废
+    result = text_to_segments("1|Alice\n2|Alice|译文", original)
+    assert rows(result) == [(2, 3.0, 4.0, "译文")]
+
+
+@pytest.mark.parametrize("fault", ["drop_rate", "malformed_rate", "truncated_rate", "reorder_rate"])
+def test_translate_batch_repairs_faulty_replies(make_translator, make_segments, mock_config, fault):
+    setattr(mock_config, fault, 1.0 if fault == "reorder_rate" else 0.3)
+    translator = make_translator(max_retries=5)
+    batch = make_segments(10)
+
+    result = translator._translate_batch(batch, translator._create_history().snapshot())
+
+    # 按批次原顺序返回，每行一次，保留原始时间
+    assert rows(result) == expected(batch)
+    stats = translator.stats.as_dict()
+    if fault == "reorder_rate":
+        assert stats["requests"] == 1
+    else:
+        # 只补翻缺失的行，而不是整批重试
+        assert stats["repair_requests"] > 0
+
+
+def test_translate_batch_bisects_then_gives_up(make_translator, make_segments, mock_config):
+    mock_config.drop_rate = 1.0
+    translator = make_translator(max_retries=1)
+    batch = make_segments(4)
+
+    with pytest.raises(Exception, match="Translation failed"):
+        translator._translate_batch(batch, translator._create_history().snapshot())
+    assert translator.stats.as_dict()["bisections"] >= 1
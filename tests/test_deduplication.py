@@ -0,0 +1,34 @@
+"""
+文件内去重的回归测试（在本进程内启动模拟服务器）：
+角色和规范化文本相同的行只翻译一次，译文复制到其余各行并保留各自的时间。
+
+运行：
+    python -m pytest tests/test_deduplication.py
+"""
+from models.subtitle import Subtitle
+
+
+def test_duplicate_lines_are_translated_once(make_translator, make_segments):
+    segments = make_segments(6)
+    # 第 5、6 行与第 2 行相同（空白不同）
+    segments[4].text = "line  2"
+    segments[5].text = " line 2 "
+    translator = make_translator()
+
+    result = translator.translate(Subtitle(segments)).segments
+
+    assert [seg.line_number for seg in result] == [1, 2, 3, 4, 5, 6]
+    assert [seg.text for seg in result[4:]] == ["2-line 2", "2-line 2"]
+    assert [(seg.start, seg.end) for seg in result[4:]] == [(10.0, 11.5), (12.0, 13.5)]
+    assert translator.stats.as_dict()["deduplicated_lines"] == 2
+
+
+def test_deduplication_can_be_disabled(make_translator, make_segments):
+    segments = make_segments(3)
+    segments[2].text = "line 1"
+    translator = make_translator(deduplicate=False)
+
+    result = translator.translate(Subtitle(segments)).segments
+
+    assert [seg.text for seg in result] == ["1-line 1", "2-line 2", "3-line 1"]
+    assert translator.stats.as_dict()["deduplicated_lines"] == 0
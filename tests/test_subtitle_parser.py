@@ -0,0 +1,98 @@
+"""
+utils.subtitle_parser 的回归测试：BOM、CRLF、WebVTT 头部与 cue 设置、多行字幕。
+
+运行：
+    python -m pytest tests/test_subtitle_parser.py
+"""
+import codecs
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.subtitle_parser import decode_subtitle_bytes, parse_subtitle_file, parse_subtitle_text
+
+SRT = (
+    "1\n"
+    "00:00:01,000 --> 00:00:02,500\n"
+    "Hello\n"
+    "\n"
+    "2\n"
+    "00:00:03,250 --> 00:00:05,000\n"
+    "First line\n"
+    "second line\n"
+    "\n"
+    "3\n"
+    "01:02:03,004 --> 01:02:04,005\n"
+    "Late\n"
+)
+
+VTT = (
+    "WEBVTT - sample\n"
+    "Kind: captions\n"
+    "\n"
+    "NOTE this block\n"
+    "is ignored\n"
+    "\n"
+    "STYLE\n"
+    "::cue { color: yellow }\n"
+    "\n"
+    "intro\n"
+    "00:01.000 --> 00:02.500 align:start position:10%\n"
+    "Hello\n"
+    "\n"
+    "00:00:03.250 --> 00:00:05.000 line:0 size:50%\n"
+    "Two\n"
+    "lines\n"
+)
+
+
+def rows(subtitle):
+    return [(seg.start, seg.end, seg.text, seg.line_number) for seg in subtitle.segments]
+
+
+def test_srt_multiline_cues():
+    assert rows(parse_subtitle_text(SRT)) == [
+        (1.0, 2.5, "Hello", 1),
+        (3.25, 5.0, "First line second line", 2),
+        (3723.004, 3724.005, "Late", 3),
+    ]
+
+
+def test_srt_with_bom_and_crlf(tmp_path):
+    path = tmp_path / "bom.srt"
+    path.write_bytes(codecs.BOM_UTF8 + SRT.replace("\n", "\r\n").encode("utf-8"))
+    assert rows(parse_subtitle_file(str(path))) == rows(parse_subtitle_text(SRT))
+
+
+def test_utf16_bom_and_bare_cr():
+    data = codecs.BOM_UTF16_LE + SRT.replace("\n", "\r").encode("utf-16-le")
+    assert decode_subtitle_bytes(data) == SRT
+
+
+def test_vtt_header_notes_identifiers_and_cue_settings():
+    assert rows(parse_subtitle_text(VTT)) == [
+        (1.0, 2.5, "Hello", 1),
+        (3.25, 5.0, "Two lines", 2),
+    ]
+
+
+def test_vtt_file_with_crlf(tmp_path):
+    path = tmp_path / "sample.vtt"
+    path.write_bytes(codecs.BOM_UTF8 + VTT.replace("\n", "\r\n").encode("utf-8"))
+    assert rows(parse_subtitle_file(str(path))) == rows(parse_subtitle_text(VTT))
+
+
+def test_missing_blank_line_and_empty_cues():
+    text = (
+        "1\n00:00:01,000 --> 00:00:02,000\nOne\n"
+        "2\n00:00:03,000 --> 00:00:04,000\nTwo\n\n"
+        "3\n00:00:05,000 --> 00:00:06,000\n\n"
+        "4\n00:00:07,000 --> 00:00:08,000\nFour\n"
+    )
+    # 缺少空行时混入的下一条序号被去掉；没有文本的字幕被忽略，行号连续
+    assert rows(parse_subtitle_text(text)) == [
+        (1.0, 2.0, "One", 1),
+        (3.0, 4.0, "Two", 2),
+        (7.0, 8.0, "Four", 3),
+    ]
@@ -0,0 +1,103 @@
+"""
+翻译断点日志的回归测试（在本进程内启动模拟服务器）：
+中断后从日志续传并恢复对话历史、提示词变化时丢弃旧日志、失败时仍在进行的批次完成后写入日志。
+
+运行：
+    python -m pytest tests/test_translation_journal.py
+"""
+import os
+import threading
+import time
+
+import pytest
+
+from models.subtitle import Subtitle
+
+
+def expected(segments):
+    """模拟服务器把 n|角色|文本 译为 n|角色|n-文本"""
+    return [(seg.line_number, seg.start, seg.end, f"{seg.line_number}-{seg.text}") for seg in segments]
+
+
+def rows(segments):
+    return [(seg.line_number, seg.start, seg.end, seg.text) for seg in segments]
+
+
+def test_journal_resumes_after_partial_run(make_translator, make_segments, tmp_path, monkeypatch):
+    segments = make_segments(30)
+    journal_path = str(tmp_path / "episode.zh.journal")
+
+    # 第一次运行：第三个批次失败
+    translator = make_translator()
+    run_batch = translator._run_batch
+
+    def failing_run_batch(batch, history):
+        if batch[0].line_number == 21:
+            raise RuntimeError("interrupted")
+        return run_batch(batch, history)
+
+    monkeypatch.setattr(translator, "_run_batch", failing_run_batch)
+    with pytest.raises(RuntimeError, match="interrupted"):
+        translator.translate(Subtitle(segments), translator.create_journal(journal_path))
+    assert translator.stats.as_dict()["requests"] == 2
+
+    # 第二次运行：前两个批次从日志恢复，只请求剩余的批次，并带上恢复的对话历史
+    translator = make_translator()
+    sent = []
+    request = translator._request
+
+    def recording_request(messages, batch=None):
+        sent.append(messages)
+        return request(messages, batch)
+
+    monkeypatch.setattr(translator, "_request", recording_request)
+    result = translator.translate(Subtitle(segments), translator.create_journal(journal_path))
+
+    assert rows(result.segments) == expected(segments)
+    assert len(sent) == 1
+    history = [message["content"] for message in sent[0][:-1]]
+    assert any(content.startswith("11|Alice|line 11") for content in history)
+    assert any(content.startswith("11|Alice|11-line 11") for content in history)
+
+
+def test_journal_from_another_prompt_is_discarded(make_translator, make_segments, tmp_path):
+    segments = make_segments(10)
+    journal_path = str(tmp_path / "episode.zh.journal")
+    translator = make_translator()
+    translator.translate(Subtitle(segments), translator.create_journal(journal_path))
+    assert os.path.exists(journal_path)
+
+    other = make_translator(prompt="another prompt")
+    other.translate(Subtitle(segments), other.create_journal(journal_path))
+    assert other.stats.as_dict()["requests"] == 1
+
+
+def test_batches_in_flight_when_a_batch_fails_are_journaled(make_translator, make_segments, tmp_path, monkeypatch):
+    segments = make_segments(20)
+    journal_path = str(tmp_path / "episode.zh.journal")
+    translator = make_translator(batch_size=5, concurrency=4)
+    run_batch = translator._run_batch
+    started = threading.Barrier(4, timeout=5)
+    release = threading.Event()
+
+    def failing_run_batch(batch, history):
+        started.wait()
+        if batch[0].line_number == 1:
+            raise RuntimeError("interrupted")
+        # 其余批次在第一个批次失败之后才完成
+        release.wait(timeout=5)
+        return run_batch(batch, history)
+
+    monkeypatch.setattr(translator, "_run_batch", failing_run_batch)
+    with pytest.raises(RuntimeError, match="interrupted"):
+        translator.translate(Subtitle(segments), translator.create_journal(journal_path))
+    # 失败立即传出，不等待仍在进行的批次
+    assert not release.is_set()
+    release.set()
+
+    journal = translator.create_journal(journal_path)
+    for _ in range(50):
+        if len(journal.load()) == 3:
+            break
+        time.sleep(0.1)
+    assert [orig[0].line_number for orig, _ in journal.load()] == [6, 11, 16]
@@ -0,0 +1,35 @@
+"""
+单个文件翻译统计的回归测试（在本进程内启动模拟服务器）：
+多个文件共用一个翻译器并发翻译时，每个文件的日志只统计自己的请求。
+
+运行：
+    python -m pytest tests/test_translation_stats.py
+"""
+import logging
+import threading
+
+from models.subtitle import Subtitle
+
+
+def test_concurrent_files_log_their_own_requests(make_translator, make_segments, mock_config, caplog):
+    mock_config.latency = 0.05
+    translator = make_translator(concurrency=2)
+    caplog.set_level(logging.INFO, logger="translators.openai_translator")
+
+    def run(count):
+        translator.translate(Subtitle(make_segments(count)))
+
+    threads = [threading.Thread(target=run, args=(count,)) for count in (20, 50)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    completed = sorted(
+        record.getMessage() for record in caplog.records if record.getMessage().startswith("Translation completed")
+    )
+    assert completed == [
+        "Translation completed: 2 requests, 0 retries, 0 repair requests, 0 bisections",
+        "Translation completed: 5 requests, 0 retries, 0 repair requests, 0 bisections",
+    ]
+    assert translator.stats.as_dict()["requests"] == 7
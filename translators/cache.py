@@ -0,0 +1,137 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class TranslationCache:
+    """
+    基于 SQLite 的翻译结果缓存（内容寻址）。
+    键为 (model, prompt 哈希, temperature, character, 原文) 的哈希，
+    支持按条目数与存活时间淘汰，并统计命中/未命中次数。
+    命中时只在内存中记录最近使用时间，由 commit() 批量写回，读取不会持有数据库写锁。
+    """
+
+    def __init__(self, path: str, max_entries: int = 200000, max_age_days: float = 30):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_age = max_age_days * 86400 if max_age_days else 0
+        self.hits = 0
+        self.misses = 0
+        self._writes = 0
+        self._lock = threading.Lock()
+        # 命中但尚未写回的最近使用时间：key -> 时间
+        self._touched: Dict[str, float] = {}
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS translations ("
+            " key TEXT PRIMARY KEY,"
+            " character TEXT NOT NULL,"
+            " text TEXT NOT NULL,"
+            " created REAL NOT NULL,"
+            " last_used REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_translations_last_used ON translations(last_used)"
+        )
+        self._conn.commit()
+        self.evict()
+
+    @staticmethod
+    def prompt_hash(*parts: str) -> str:
+        """计算提示词（及示例）的哈希，作为缓存键的一部分"""
+        h = hashlib.sha256()
+        for part in parts:
+            h.update(part.encode("utf-8"))
+            h.update(b"\0")
+        return h.hexdigest()
+
+    @staticmethod
+    def make_key(model: str, prompt_hash: str, temperature: float, character: str, text: str) -> str:
+        h = hashlib.sha256()
+        for part in (model, prompt_hash, repr(float(temperature)), character, text):
+            h.update(part.encode("utf-8"))
+            h.update(b"\0")
+        return h.hexdigest()
+
+    def get(self, key: str) -> Optional[Tuple[str, str]]:
+        """返回 (角色名, 译文)，未命中返回 None"""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT character, text, created FROM translations WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or (self.max_age and now - row[2] > self.max_age):
+                self.misses += 1
+                return None
+            self._touched[key] = now
+            self.hits += 1
+            return row[0], row[1]
+
+    def put(self, key: str, character: str, text: str) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO translations (key, character, text, created, last_used)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (key, character, text, now, now),
+            )
+            self._writes += 1
+        # 定期淘汰，避免每次写入都扫描；提交由调用方按批次进行
+        if self._writes % 1000 == 0:
+            self.evict()
+
+    def _flush_touched(self) -> None:
+        """写回命中条目的最近使用时间（调用方持有锁）"""
+        if self._touched:
+            self._conn.executemany(
+                "UPDATE translations SET last_used = ? WHERE key = ?",
+                [(used, key) for key, used in self._touched.items()],
+            )
+            self._touched.clear()
+
+    def commit(self) -> None:
+        with self._lock:
+            self._flush_touched()
+            self._conn.commit()
+
+    def evict(self) -> None:
+        """淘汰过期条目，并按最近使用时间裁剪到 max_entries"""
+        with self._lock:
+            self._flush_touched()
+            if self.max_age:
+                self._conn.execute(
+                    "DELETE FROM translations WHERE created < ?", (time.time() - self.max_age,)
+                )
+            if self.max_entries:
+                count = self._conn.execute("SELECT COUNT(*) FROM translations").fetchone()[0]
+                if count > self.max_entries:
+                    self._conn.execute(
+                        "DELETE FROM translations WHERE key IN ("
+                        " SELECT key FROM translations ORDER BY last_used ASC LIMIT ?)",
+                        (count - self.max_entries,),
+                    )
+            self._conn.commit()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._flush_touched()
+            self._conn.commit()
+            self._conn.close()
@@ -0,0 +1,203 @@
+import random
+import threading
+import time
+from typing import List, Optional
+
+from openai import APIConnectionError, APIStatusError, OpenAI
+
+from .rate_limiter import RateLimiter
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def is_endpoint_failure(error: BaseException) -> bool:
+    """
+    是否为接口本身的故障（5xx、超时、连接错误），只有这些错误计入摘除。
+    400（如上下文过长）、429 等与单个请求有关的错误说明接口仍能正常响应。
+    """
+    if isinstance(error, APIStatusError):
+        return error.status_code >= 500
+    # APITimeoutError 是 APIConnectionError 的子类
+    return isinstance(error, APIConnectionError)
+
+
+class Endpoint:
+    """一个 OpenAI 兼容接口：客户端、模型、权重、并发上限、限流器以及健康状态"""
+
+    # 延迟和错误率的指数滑动平均系数
+    EWMA_ALPHA = 0.3
+
+    def __init__(
+        self,
+        api_base: str,
+        api_key: str,
+        model: str,
+        weight: float = 1.0,
+        max_concurrency: int = 0,
+        rate_limiter: Optional[RateLimiter] = None,
+        name: Optional[str] = None,
+    ):
+        self.api_base = api_base
+        self.model = model
+        self.weight = max(0.0, float(weight))
+        # 0 表示不限制
+        self.max_concurrency = max(0, int(max_concurrency or 0))
+        self.rate_limiter = rate_limiter or RateLimiter()
+        self.name = name or api_base
+        # 重试由 OpenAITranslator 统一处理
+        self.client = OpenAI(base_url=api_base, api_key=api_key, max_retries=0)
+
+        self.in_flight = 0
+        self.latency = None      # 成功请求耗时的 EWMA（秒）
+        self.error_rate = 0.0    # 失败率的 EWMA
+        self.consecutive_failures = 0
+        self.ejections = 0       # 连续被摘除的次数，决定下一次摘除的时长
+        self.ejected_until = 0.0
+        self.requests = 0
+        self.failures = 0
+
+    def _update(self, success: bool, latency: Optional[float]) -> None:
+        alpha = self.EWMA_ALPHA
+        self.error_rate = (1 - alpha) * self.error_rate + alpha * (0.0 if success else 1.0)
+        if success and latency is not None:
+            self.latency = latency if self.latency is None else (1 - alpha) * self.latency + alpha * latency
+
+
+class EndpointPool:
+    """
+    多接口负载均衡：按权重和健康状况（错误率、延迟 EWMA）加权随机选择接口。
+    连续失败 eject_after_failures 次的接口被暂时摘除，摘除时间到期后放行一个探测请求，
+    成功则重新加入，失败则以加倍的时长再次摘除。
+    最后一个健康的接口不会被摘除（例如只有一个接口时），失败只交给重试退避处理。
+    """
+
+    MAX_EJECTION_FACTOR = 8
+
+    def __init__(self, endpoints: List[Endpoint], eject_after_failures: int = 3, eject_seconds: float = 30):
+        if not endpoints:
+            raise ValueError("EndpointPool requires at least one endpoint")
+        if not any(endpoint.weight > 0 for endpoint in endpoints):
+            raise ValueError("EndpointPool requires at least one endpoint with a positive weight")
+        self.endpoints = endpoints
+        self.eject_after_failures = max(1, int(eject_after_failures))
+        self.eject_seconds = eject_seconds
+        self._condition = threading.Condition()
+        self._random = random.Random()
+
+    def __len__(self) -> int:
+        return len(self.endpoints)
+
+    @property
+    def models(self) -> List[str]:
+        return sorted({endpoint.model for endpoint in self.endpoints})
+
+    def _available(self, endpoint: Endpoint, now: float) -> bool:
+        if endpoint.weight <= 0:
+            return False
+        if endpoint.ejected_until > now:
+            return False
+        # 摘除到期后只放行一个探测请求
+        if endpoint.ejections and endpoint.in_flight:
+            return False
+        return not endpoint.max_concurrency or endpoint.in_flight < endpoint.max_concurrency
+
+    def _score(self, endpoint: Endpoint, best_latency: float, now: float) -> float:
+        score = endpoint.weight * max(0.05, 1 - endpoint.error_rate)
+        if endpoint.latency:
+            score *= best_latency / endpoint.latency
+        # 正在按 Retry-After 退避的接口尽量不选
+        if endpoint.rate_limiter.blocked_for(now) > 0:
+            score *= 0.01
+        return score
+
+    def _choose(self, now: float) -> Optional[Endpoint]:
+        candidates = [endpoint for endpoint in self.endpoints if self._available(endpoint, now)]
+        if not candidates:
+            return None
+        latencies = [endpoint.latency for endpoint in candidates if endpoint.latency]
+        best_latency = min(latencies) if latencies else 1.0
+        scores = [self._score(endpoint, best_latency, now) for endpoint in candidates]
+        return self._random.choices(candidates, weights=scores)[0]
+
+    def acquire(self) -> Endpoint:
+        """选择一个接口并占用一个并发名额；所有接口都已满或被摘除时阻塞等待"""
+        with self._condition:
+            while True:
+                now = time.monotonic()
+                endpoint = self._choose(now)
+                if endpoint is not None:
+                    endpoint.in_flight += 1
+                    endpoint.requests += 1
+                    return endpoint
+                # 等待其他请求释放名额，或最早的摘除到期
+                ejected = [e.ejected_until for e in self.endpoints if e.ejected_until > now]
+                timeout = min(ejected) - now if ejected else None
+                self._condition.wait(timeout)
+
+    def release(self, endpoint: Endpoint, success: bool, latency: Optional[float] = None) -> None:
+        """归还名额并记录请求结果；success 为 False 表示接口故障（见 is_endpoint_failure）"""
+        with self._condition:
+            endpoint.in_flight -= 1
+            endpoint._update(success, latency)
+            if success:
+                if endpoint.ejections:
+                    logger.info(f"Endpoint {endpoint.name} recovered, re-admitting it")
+                endpoint.consecutive_failures = 0
+                endpoint.ejections = 0
+            else:
+                endpoint.failures += 1
+                endpoint.consecutive_failures += 1
+                # 探测请求失败，或连续失败达到阈值时摘除
+                if endpoint.ejections or endpoint.consecutive_failures >= self.eject_after_failures:
+                    if self._has_healthy_other(endpoint, time.monotonic()):
+                        self._eject(endpoint)
+                    else:
+                        # 摘除后将没有可用的接口：保留该接口，恢复正常放行
+                        endpoint.consecutive_failures = 0
+                        endpoint.ejections = 0
+            self._condition.notify_all()
+
+    def _has_healthy_other(self, endpoint: Endpoint, now: float) -> bool:
+        """除 endpoint 外是否还有未被摘除、也不在探测中的接口"""
+        return any(
+            other is not endpoint
+            and other.weight > 0
+            and other.ejected_until <= now
+            and not other.ejections
+            for other in self.endpoints
+        )
+
+    def _eject(self, endpoint: Endpoint) -> None:
+        endpoint.ejections += 1
+        factor = min(2 ** (endpoint.ejections - 1), self.MAX_EJECTION_FACTOR)
+        seconds = self.eject_seconds * factor
+        endpoint.ejected_until = time.monotonic() + seconds
+        endpoint.consecutive_failures = 0
+        logger.warning(f"Ejecting endpoint {endpoint.name} for {seconds:.0f}s after repeated failures")
+
+    def has_alternative(self, endpoint: Endpoint) -> bool:
+        """除 endpoint 外是否还有可以立即使用的健康接口"""
+        with self._condition:
+            now = time.monotonic()
+            return any(
+                other is not endpoint
+                and other.weight > 0
+                and other.ejected_until <= now
+                and other.rate_limiter.blocked_for(now) <= 0
+                for other in self.endpoints
+            )
+
+    def summary(self) -> List[dict]:
+        with self._condition:
+            return [
+                {
+                    "name": endpoint.name,
+                    "requests": endpoint.requests,
+                    "failures": endpoint.failures,
+                    "latency": round(endpoint.latency, 3) if endpoint.latency else None,
+                    "ejected": endpoint.ejected_until > time.monotonic(),
+                }
+                for endpoint in self.endpoints
+            ]
@@ -0,0 +1,28 @@
+from typing import List, Tuple
+from models.subtitle import CompactSubtitle, SubtitleSegment
+
+
+class TranslationHistory:
+    """
+    翻译对话历史，按行保存原文和译文对（只追加）。
+    第 0 项始终是示例输入/输出。
+    """
+
+    def __init__(self, example_input: SubtitleSegment, example_output: SubtitleSegment):
+        self.orig_segments = CompactSubtitle([example_input])
+        self.trans_segments = CompactSubtitle([example_output])
+
+    def extend(self, orig: List[SubtitleSegment], trans: List[SubtitleSegment]) -> None:
+        self.orig_segments.extend(orig)
+        self.trans_segments.extend(trans)
+
+    def snapshot(self) -> Tuple[CompactSubtitle, CompactSubtitle]:
+        """
+        返回当前历史的视图（不复制）。
+        历史只追加，视图的范围在创建时固定：并发翻译时，每个批次在提交时获取快照，
+        之后提交的批次不会影响其上下文。
+        """
+        return self.orig_segments[:], self.trans_segments[:]
+
+    def __len__(self) -> int:
+        return len(self.orig_segments) - 1
@@ -0,0 +1,81 @@
+import json
+import os
+import threading
+from dataclasses import asdict
+from typing import List, Tuple
+
+from models.subtitle import SubtitleSegment
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class TranslationJournal:
+    """
+    翻译断点日志（JSON Lines，只追加）。
+    第一行为头信息（模型与提示词指纹），之后每行记录一个已完成批次的原文和译文片段，
+    重新运行时按顺序回放，恢复已翻译的行以及对话历史。
+    """
+
+    VERSION = 1
+
+    def __init__(self, path: str, fingerprint: str):
+        self.path = path
+        self.fingerprint = fingerprint
+        self._lock = threading.Lock()
+        self._header_written = False
+
+    def load(self) -> List[Tuple[List[SubtitleSegment], List[SubtitleSegment]]]:
+        """读取已完成的批次；头信息不匹配（模型或提示词已修改）时丢弃旧日志"""
+        if not os.path.exists(self.path):
+            return []
+
+        batches = []
+        with open(self.path, "r", encoding="utf-8") as f:
+            lines = f.readlines()
+        try:
+            header = json.loads(lines[0]) if lines else {}
+        except ValueError:
+            header = {}
+        if header.get("version") != self.VERSION or header.get("fingerprint") != self.fingerprint:
+            logger.info(f"Discarding stale translation journal {self.path}")
+            os.remove(self.path)
+            return []
+
+        valid_lines = lines[:1]
+        for line in lines[1:]:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # 最后一行可能在崩溃时只写了一半，截断后再继续追加
+                with open(self.path, "w", encoding="utf-8") as f:
+                    f.writelines(valid_lines)
+                break
+            valid_lines.append(line)
+            batches.append((
+                [SubtitleSegment(**seg) for seg in record["orig"]],
+                [SubtitleSegment(**seg) for seg in record["trans"]],
+            ))
+        self._header_written = True
+        logger.info(f"Resuming {len(batches)} translated batches from {self.path}")
+        return batches
+
+    def append(self, orig: List[SubtitleSegment], trans: List[SubtitleSegment]) -> None:
+        record = {
+            "orig": [asdict(seg) for seg in orig],
+            "trans": [asdict(seg) for seg in trans],
+        }
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                if not self._header_written:
+                    f.write(json.dumps({"version": self.VERSION, "fingerprint": self.fingerprint}) + "\n")
+                    self._header_written = True
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+
+    def remove(self) -> None:
+        with self._lock:
+            if os.path.exists(self.path):
+                os.remove(self.path)
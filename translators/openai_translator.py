@@ -1,16 +1,34 @@
+import contextvars
 import openai
-from openai import OpenAI
+import queue
+import threading
 import time
 import math
-from typing import Tuple, List
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Tuple, List, Optional, Iterable, Iterator, Sequence
 from models.subtitle import Subtitle, SubtitleSegment
 from .base_translator import BaseTranslator
+from .cache import TranslationCache
+from .endpoints import Endpoint, EndpointPool, is_endpoint_failure
+from .history import TranslationHistory
+from .journal import TranslationJournal
+from .rate_limiter import RateLimiter, parse_retry_after
+from .stats import TranslationStats
 from utils.text_format import segments_to_text, text_to_segments, create_segment
-import traceback
+from utils.metrics import metrics
+from utils.tokens import estimate_tokens, estimate_messages_tokens, MESSAGE_OVERHEAD_TOKENS
 import logging
 
 logger = logging.getLogger(__name__)
 
+# 当前 translate_stream 调用（即当前文件）的统计；工作线程通过 contextvars.copy_context() 继承，
+# 多个文件共用一个翻译器并发翻译时，各自的日志只统计自己的请求
+_file_stats = contextvars.ContextVar("translation_file_stats", default=None)
+
+# 历史快照：(原文片段序列, 译文片段序列)，第 0 项为示例
+HistorySnapshot = Tuple[Sequence[SubtitleSegment], Sequence[SubtitleSegment]]
+
 
 class OpenAITranslator(BaseTranslator):
     def __init__(
@@ -24,12 +42,21 @@ class OpenAITranslator(BaseTranslator):
         retry_delay: int = 5,
         batch_size: int = 20,
         history_size: int = 50,
+        history_mode: str = "sliding",
+        history_step: int = 0,
         example_input: str = "0|Alice|天気がいいですね",
         example_output: str = "0|Alice|天气真好啊",
+        cache: Optional[TranslationCache] = None,
+        concurrency: int = 1,
+        max_prompt_tokens: int = 0,
+        max_batch_tokens: int = 0,
+        rate_limiter: Optional[RateLimiter] = None,
+        stream: bool = False,
+        deduplicate: bool = True,
+        endpoints: Optional[EndpointPool] = None,
     ):
         self.api_key = api_key
         self.api_base = api_base
-        self.model = model
         self.prompt = prompt
         self.temperature = temperature
         self.max_retries = max_retries
@@ -38,21 +65,86 @@ class OpenAITranslator(BaseTranslator):
 
         # 如果 history_size 非整数，则向上取整
         self.history_size = math.ceil(history_size)
+        # 历史窗口的移动方式：
+        # sliding: 每个请求随新历史按 batch_size 前移，只有系统提示和示例是稳定前缀；
+        # stable: 按 history_step 大步前移，起点不变的多个请求前缀逐字节相同，可以命中服务端提示词缓存，
+        #         窗口长度在 history_size 到 history_size + history_step 之间
+        if history_mode not in ("sliding", "stable"):
+            raise ValueError(f"Unknown history_mode: {history_mode}")
+        self.history_mode = history_mode
+        # 步长对齐到 batch_size，历史分组的边界保持不变；默认为 history_size 的一半
+        step = history_step or self.history_size // 2
+        self.history_step = max(1, math.ceil(step / batch_size)) * batch_size
 
         self.example_input = example_input
         self.example_output = example_output
-        self.client = OpenAI(base_url=api_base, api_key=api_key)
-
-
-
-    def translate(self, subtitle: Subtitle) -> Subtitle:
-        translated_segments = []
+        # 未配置多个接口时，使用 api_base / api_key / model 组成单接口池
+        self.endpoints = endpoints or EndpointPool([
+            Endpoint(api_base, api_key, model, rate_limiter=rate_limiter)
+        ])
+        # 缓存和断点日志按模型区分；多个模型时使用组合名称
+        self.model = "+".join(self.endpoints.models)
+        self.stats = TranslationStats()
+        # 流式接收回复，边接收边校验
+        self.stream = stream
+        # 文件内相同的 (角色, 文本) 只翻译一次
+        self.deduplicate = deduplicate
+
+        # token 预算，0 表示不限制
+        # max_batch_tokens: 单个批次待翻译内容的 token 上限
+        # max_prompt_tokens: 整个请求（系统提示 + 历史 + 批次）的 token 上限，超出时裁剪最旧的历史
+        self.max_prompt_tokens = max_prompt_tokens or 0
+        self.max_batch_tokens = max_batch_tokens or 0
+
+        # 同时进行中的批次数量
+        self.concurrency = max(1, int(concurrency))
+
+        self.cache = cache
+        self._prompt_hash = TranslationCache.prompt_hash(prompt, example_input, example_output)
+        # 各工作线程最近一次请求使用的接口
+        self._local = threading.local()
+
+    def _count(self, **counts) -> None:
+        """累加翻译统计，同时计入当前文件的运行指标"""
+        self.stats.add(**counts)
+        file_stats = _file_stats.get()
+        if file_stats is not None:
+            file_stats.add(**counts)
+        metrics.count(**counts)
+
+    def _cache_key(self, segment: SubtitleSegment) -> str:
+        return TranslationCache.make_key(
+            self.model, self._prompt_hash, self.temperature, segment.character, segment.text
+        )
 
-        # 初始化对话历史，保存原文和翻译对（以行单位）
-        self.orig_segments = []
-        self.trans_segments = []
+    def _lookup_cache(self, segment: SubtitleSegment) -> Optional[SubtitleSegment]:
+        """查询缓存，命中时返回带原始行号和时间的译文片段"""
+        if self.cache is None:
+            return None
+        entry = self.cache.get(self._cache_key(segment))
+        if entry is None:
+            return None
+        character, text = entry
+        return SubtitleSegment(
+            start=segment.start,
+            end=segment.end,
+            text=text,
+            line_number=segment.line_number,
+            character=character,
+        )
 
-        # 插入示例输入输出到segments
+    def _store_cache(self, batch: List[SubtitleSegment], translated: List[SubtitleSegment]) -> None:
+        if self.cache is None:
+            return
+        translation_map = {seg.line_number: seg for seg in translated}
+        for seg in batch:
+            result = translation_map.get(seg.line_number)
+            if result is not None:
+                self.cache.put(self._cache_key(seg), result.character, result.text)
+        self.cache.commit()
+
+    def _create_history(self) -> TranslationHistory:
+        """初始化对话历史，并插入示例输入输出"""
         split_input = self.example_input.split("|")
         split_output = self.example_output.split("|")
         example_input_segment = create_segment(
@@ -61,147 +153,577 @@ class OpenAITranslator(BaseTranslator):
         example_output_segment = create_segment(
             split_output[0], split_output[2], split_output[1]
         )
-        self.orig_segments.append(example_input_segment)
-        self.trans_segments.append(example_output_segment)
+        return TranslationHistory(example_input_segment, example_output_segment)
 
-        # 按照 batch_size 进行批量翻译
-        for i in range(0, len(subtitle.segments), self.batch_size):
-            batch = subtitle.segments[i : i + self.batch_size]
+    def create_journal(self, path: str) -> TranslationJournal:
+        """创建断点日志，模型或提示词变化后旧日志自动失效"""
+        return TranslationJournal(path, f"{self.model}|{self._prompt_hash}")
+
+    def translate(self, subtitle: Subtitle, journal: Optional[TranslationJournal] = None) -> Subtitle:
+        return self.translate_stream(subtitle.segments, journal)
+
+    def translate_stream(
+        self,
+        segments: Iterable[SubtitleSegment],
+        journal: Optional[TranslationJournal] = None,
+    ) -> Subtitle:
+        """
+        翻译一个片段序列，可以是逐条产生片段的生成器（例如边识别边输出的 Whisper）。
+        每凑满一个批次（batch_size 行或 token 预算）立即派发，不必等待全部片段。
+        提供 journal 时，每个完成的批次会写入日志；重新运行时从日志恢复已翻译的行和对话历史。
+        """
+        token = _file_stats.set(TranslationStats())
+        try:
+            return self._translate_stream(segments, journal)
+        finally:
+            _file_stats.reset(token)
+
+    def _translate_stream(
+        self, segments: Iterable[SubtitleSegment], journal: Optional[TranslationJournal]
+    ) -> Subtitle:
+        order = []
+        translated_map = {}
+        cache_hits = 0
+        cache_misses = 0
+
+        history = self._create_history()
+
+        # 回放断点日志：恢复历史和译文，对应原文未变化的行不再翻译
+        resumed = {}
+        if journal is not None:
+            for orig, trans in journal.load():
+                history.extend(orig, trans)
+                resumed.update({seg.line_number: seg.text for seg in orig})
+                for seg in trans:
+                    translated_map[seg.line_number] = seg
+
+        # 去重：(角色, 规范化文本) 相同的行只翻译第一次出现的代表行，结束后复制给其余各行
+        representatives = {}
+        followers = {}
+
+        def pending() -> Iterator[SubtitleSegment]:
+            nonlocal cache_hits, cache_misses
+            for seg in segments:
+                order.append(seg)
+                if self.deduplicate:
+                    key = (seg.character, self._normalize_text(seg.text))
+                    representative = representatives.get(key)
+                    if representative is not None:
+                        followers.setdefault(representative, []).append(seg)
+                        continue
+                    representatives[key] = seg.line_number
+                if resumed.get(seg.line_number) == seg.text and seg.line_number in translated_map:
+                    continue
+                cached = self._lookup_cache(seg)
+                if cached is not None:
+                    translated_map[seg.line_number] = cached
+                    cache_hits += 1
+                    metrics.count(cache_hits=1)
+                    continue
+                if self.cache is not None:
+                    cache_misses += 1
+                    metrics.count(cache_misses=1)
+                yield seg
+
+        # 流式输入（生成器）在后台线程中读取，翻译进行时上游（如 Whisper 识别）继续产出片段
+        prefetched = None
+        if iter(segments) is segments:
+            segments = prefetched = self._prefetch(segments, self.batch_size * (self.concurrency + 1))
+
+        # 按照 batch_size 和 token 预算对未命中缓存的片段分批
+        batches = self._pack_batches(pending())
+
+        # 最多同时进行 concurrency 个批次；每个批次提交时获取历史快照，
+        # 结果按提交顺序写回历史，因此并发为 1 时与串行翻译完全一致。
+        executor = ThreadPoolExecutor(max_workers=self.concurrency)
+        in_flight = deque()
+        exhausted = False
+        try:
+            def commit_head() -> None:
+                batch, future = in_flight.popleft()
+                result = future.result()
+                history.extend(batch, result)
+                if journal is not None:
+                    journal.append(batch, result)
+                self._store_cache(batch, result)
+                for seg in result:
+                    translated_map[seg.line_number] = seg
+
+            while True:
+                # 先提交已完成的批次，使后续批次获得尽可能新的历史
+                while in_flight and (
+                    in_flight[0][1].done() or exhausted or len(in_flight) >= self.concurrency
+                ):
+                    commit_head()
+                if exhausted:
+                    break
+                # 获取下一个批次（流式输入时可能阻塞等待上游）
+                batch = next(batches, None)
+                if batch is None:
+                    exhausted = True
+                    continue
+                # 复制上下文，使工作线程中记录的指标归属于当前文件
+                future = executor.submit(
+                    contextvars.copy_context().run, self._run_batch, batch, history.snapshot()
+                )
+                in_flight.append((batch, future))
+        except BaseException:
+            # 某个批次最终失败：不再等待其余批次。尚未开始的批次被取消，
+            # 已在进行中的批次完成后仍写入断点日志和缓存，已付费的结果不会丢失
+            if in_flight:
+                threading.Thread(
+                    target=self._save_abandoned, args=(list(in_flight), journal), name="save-abandoned"
+                ).start()
+            raise
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+            # 翻译失败时停止后台读取
+            if prefetched is not None:
+                prefetched.close()
+            # 写回命中条目的最近使用时间，全部命中时也不会遗留未提交的事务
+            if self.cache is not None:
+                self.cache.commit()
+
+        self._copy_duplicates(followers, translated_map)
+
+        stats = _file_stats.get().as_dict()
+        logger.info(
+            f"Translation completed: {stats['requests']} requests, {stats['retries']} retries, "
+            f"{stats['repair_requests']} repair requests, {stats['bisections']} bisections"
+        )
+        if len(self.endpoints) > 1:
+            for endpoint in self.endpoints.summary():
+                logger.info(
+                    f"Endpoint {endpoint['name']}: {endpoint['requests']} requests, "
+                    f"{endpoint['failures']} failures, latency {endpoint['latency'] or 0:.2f}s"
+                )
+        if stats['prompt_tokens']:
+            logger.info(
+                f"Prompt cache: {stats['cached_tokens']} of {stats['prompt_tokens']} prompt tokens cached "
+                f"({stats['cached_tokens'] / stats['prompt_tokens']:.1%})"
+            )
+        if stats['deduplicated_lines']:
+            logger.info(
+                f"Deduplication: {stats['deduplicated_lines']} repeated lines reused, "
+                f"~{stats['deduplicated_tokens']} tokens saved"
+            )
+        if self.cache is not None:
+            # 去重的重复行和从断点日志恢复的行不查询缓存，不计入
+            cache_stats = self.cache.stats()
+            logger.info(
+                f"Translation cache: {cache_hits} hits, {cache_misses} misses "
+                f"(since start: {cache_stats['hits']} hits, {cache_stats['misses']} misses, "
+                f"{cache_stats['hit_rate']:.1%} hit rate)"
+            )
+        # 按原始顺序输出
+        return Subtitle([
+            translated_map[seg.line_number]
+            for seg in order
+            if seg.line_number in translated_map
+        ])
+
+    def _save_abandoned(
+        self, in_flight: List[Tuple[List[SubtitleSegment], Future]], journal: Optional[TranslationJournal]
+    ) -> None:
+        """文件翻译失败后才完成的批次：按提交顺序写入断点日志和缓存，下次运行时不必重新请求"""
+        for batch, future in in_flight:
+            if future.cancelled() or future.exception() is not None:
+                continue
+            result = future.result()
             try:
-                result = self._translate_batch(batch)
+                if journal is not None:
+                    journal.append(batch, result)
+                self._store_cache(batch, result)
             except Exception as e:
-                logger.warning(
-                    f"Batch translation failed after retries, switching to line-by-line translation. Error: {str(e)}"
-                )
-                result = self._translate_line_by_line(batch)
-            translated_segments.extend(result)
-            time.sleep(self.retry_delay)
+                # 程序可能已在退出并关闭了缓存
+                logger.warning(f"Could not save batch ending at line {batch[-1].line_number}: {e}")
+                return
+            logger.info(f"Saved batch ending at line {batch[-1].line_number} finished after the file failed")
+        if self.cache is not None:
+            self.cache.commit()
+
+    @staticmethod
+    def _prefetch(iterable: Iterable, maxsize: int) -> Iterator:
+        """
+        在后台线程中读取 iterable，经有界队列交给调用方，上游的异常在调用方重新抛出。
+        调用方关闭返回的生成器时，后台线程停止读取并关闭上游生成器。
+        """
+        items = queue.Queue(maxsize=max(1, maxsize))
+        stop = threading.Event()
 
-        logger.info("Translation completed")
-        return Subtitle(translated_segments)
+        def put(entry: tuple) -> bool:
+            while not stop.is_set():
+                try:
+                    items.put(entry, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def produce() -> None:
+            iterator = iter(iterable)
+            try:
+                for item in iterator:
+                    if not put(("item", item)):
+                        return
+                put(("done", None))
+            except BaseException as e:
+                put(("error", e))
+            finally:
+                close = getattr(iterator, "close", None)
+                if close is not None:
+                    close()
+
+        # 复制上下文，使上游记录的指标归属于当前文件
+        thread = threading.Thread(
+            target=contextvars.copy_context().run, args=(produce,), name="prefetch", daemon=True
+        )
+        thread.start()
+        try:
+            while True:
+                kind, value = items.get()
+                if kind == "item":
+                    yield value
+                elif kind == "error":
+                    raise value
+                else:
+                    return
+        finally:
+            stop.set()
+
+    @staticmethod
+    def _normalize_text(text: str) -> str:
+        """去重用的文本规范化：合并空白"""
+        return " ".join(text.split())
+
+    def _copy_duplicates(self, followers: dict, translated_map: dict) -> None:
+        """把代表行的译文复制到所有重复行（保留各自的行号和时间）"""
+        copied = 0
+        saved_tokens = 0
+        for representative, segments in followers.items():
+            translated = translated_map.get(representative)
+            if translated is None:
+                continue
+            for seg in segments:
+                translated_map[seg.line_number] = SubtitleSegment(
+                    start=seg.start,
+                    end=seg.end,
+                    text=translated.text,
+                    line_number=seg.line_number,
+                    character=translated.character,
+                )
+                copied += 1
+                # 省下的输入和输出 token
+                saved_tokens += estimate_tokens(segments_to_text([seg])) + estimate_tokens(
+                    segments_to_text([translated_map[seg.line_number]])
+                )
+        self._count(deduplicated_lines=copied, deduplicated_tokens=saved_tokens)
 
-    def _build_messages(self, incoming_message: List[SubtitleSegment]) -> List[dict]:
+    def _pack_batches(self, segments: Iterable[SubtitleSegment]) -> Iterator[List[SubtitleSegment]]:
+        """
+        将片段打包成批次：每批最多 batch_size 行，且待翻译文本不超过 max_batch_tokens。
+        单行超出预算时独占一个批次。
+        """
+        batch = []
+        batch_tokens = 0
+        for seg in segments:
+            seg_tokens = estimate_tokens(segments_to_text([seg])) + 1
+            if batch and self.max_batch_tokens and batch_tokens + seg_tokens > self.max_batch_tokens:
+                yield batch
+                batch = []
+                batch_tokens = 0
+            batch.append(seg)
+            batch_tokens += seg_tokens
+            # 行数已满立即产出，流式输入时无需等待下一行
+            if len(batch) >= self.batch_size:
+                yield batch
+                batch = []
+                batch_tokens = 0
+        if batch:
+            yield batch
+
+    def _build_messages(self, incoming_message: List[SubtitleSegment], history: HistorySnapshot) -> List[dict]:
         """
         构建对话消息，将系统提示、历史对话以及当前用户消息组合起来。
         历史对话按 batch_size 组成 role pair，以便更好利用 LLM 缓存。
         """
+        orig_segments, trans_segments = history
         messages = [{"role": "system", "content": self.prompt}]
 
         # 始终包含第一个示例片段作为第一个 role pair
-        if len(self.orig_segments) > 0:
-            messages.append({"role": "user", "content": segments_to_text([self.orig_segments[0]])})
-            messages.append({"role": "assistant", "content": segments_to_text([self.trans_segments[0]])})
+        if len(orig_segments) > 0:
+            messages.append({"role": "user", "content": segments_to_text([orig_segments[0]])})
+            messages.append({"role": "assistant", "content": segments_to_text([trans_segments[0]])})
 
         # 剩余的历史记录（排除示例）
-        h_orig = self.orig_segments[1:]
-        h_trans = self.trans_segments[1:]
+        h_orig = orig_segments[1:]
+        h_trans = trans_segments[1:]
 
         if len(h_orig) > 0:
-            # 限制历史记录数量，并按 batch_size 对齐以保持前缀稳定
-            start = max(0, len(h_orig) - self.history_size)
-            # 向上取整到 batch_size 的倍数，确保不超出 history_size 且对齐
-            start = math.ceil(start / self.batch_size) * self.batch_size
-            
+            start = self._history_start(len(h_orig))
             h_orig = h_orig[start:]
             h_trans = h_trans[start:]
 
-            # 按 batch_size 分组并添加为 role pairs
+            # 按 batch_size 分组为 role pairs
+            history_pairs = []
             for i in range(0, len(h_orig), self.batch_size):
                 chunk_orig = h_orig[i : i + self.batch_size]
                 chunk_trans = h_trans[i : i + self.batch_size]
                 if chunk_orig:
-                    messages.append({"role": "user", "content": segments_to_text(chunk_orig)})
-                    messages.append({"role": "assistant", "content": segments_to_text(chunk_trans)})
+                    history_pairs.append([
+                        {"role": "user", "content": segments_to_text(chunk_orig)},
+                        {"role": "assistant", "content": segments_to_text(chunk_trans)},
+                    ])
+
+            if self.max_prompt_tokens:
+                history_pairs = self._trim_history(history_pairs, messages, incoming_message)
+
+            for pair in history_pairs:
+                messages.extend(pair)
 
         # 添加当前待翻译的消息
         messages.append({"role": "user", "content": segments_to_text(incoming_message)})
         return messages
 
-    def _translate_batch(self, batch: List[SubtitleSegment]) -> Tuple[list]:
-        retries = 0
-        while retries < self.max_retries:
+    def _history_start(self, length: int) -> int:
+        """历史窗口（不含示例）的起点"""
+        overflow = max(0, length - self.history_size)
+        if self.history_mode == "stable":
+            # 向下取整到 history_step 的倍数：窗口不短于 history_size，起点只在跨过步长时改变
+            return overflow // self.history_step * self.history_step
+        # 限制历史记录数量，并向上取整到 batch_size 的倍数，确保不超出 history_size 且对齐
+        return math.ceil(overflow / self.batch_size) * self.batch_size
+
+    def _trim_history(self, history_pairs: List[list], prefix: List[dict], incoming_message: List[SubtitleSegment]) -> List[list]:
+        """按 token 预算从最旧的一组开始丢弃历史，使整个请求不超过 max_prompt_tokens"""
+        budget = (
+            self.max_prompt_tokens
+            - estimate_messages_tokens(prefix)
+            - estimate_tokens(segments_to_text(incoming_message))
+            - MESSAGE_OVERHEAD_TOKENS
+        )
+        pair_tokens = [estimate_messages_tokens(pair) for pair in history_pairs]
+        total = sum(pair_tokens)
+        start = 0
+        while start < len(history_pairs) and total > budget:
+            total -= pair_tokens[start]
+            start += 1
+        if start and self.history_mode == "stable":
+            # 起点向上取整到（能容纳的组数的一半）的倍数：起点每隔若干请求才改变，前缀保持稳定
+            group = max(1, (len(history_pairs) - start) // 2)
+            start = min(len(history_pairs), math.ceil(start / group) * group)
+        if start:
+            logger.debug(f"Trimmed {start} history pairs to fit max_prompt_tokens={self.max_prompt_tokens}")
+        return history_pairs[start:]
+
+    def _request(self, messages: List[dict], batch: Optional[List[SubtitleSegment]] = None) -> str:
+        """选择一个接口，经过该接口的限流器发送一次请求，返回回复文本"""
+        # 预估 token：提示词 + 与待翻译内容相当的回复
+        estimated = estimate_messages_tokens(messages) + estimate_tokens(messages[-1]["content"])
+        endpoint = self.endpoints.acquire()
+        self._local.endpoint = endpoint
+        success = False
+        latency = None
+        try:
+            started = time.perf_counter()
+            if endpoint.rate_limiter.acquire(estimated):
+                metrics.record("rate_limit", started, "translate", endpoint=endpoint.name)
+            started = time.perf_counter()
+            with metrics.span("request", "translate", endpoint=endpoint.name, lines=len(batch or [])) as span:
+                text = self._send(endpoint, messages, batch, estimated, span)
+            latency = time.perf_counter() - started
+            self.stats.record_latency(latency)
+            success = True
+            return text
+        except Exception as e:
+            # 记下失败的接口，重试时据此决定是否需要等待
+            e.endpoint = endpoint
+            # 与单个请求有关的错误（如 400 上下文过长）不计入接口故障
+            success = not is_endpoint_failure(e)
+            raise
+        finally:
+            self.endpoints.release(endpoint, success, latency)
+
+    def _send(
+        self,
+        endpoint: Endpoint,
+        messages: List[dict],
+        batch: Optional[List[SubtitleSegment]],
+        estimated: int,
+        span: dict,
+    ) -> str:
+        """通过 endpoint 发送请求，把 token 用量（包括命中提示词缓存的部分）记入 span"""
+        self._count(requests=1)
+        stream = self.stream and batch is not None
+        extra = {"stream": True, "stream_options": {"include_usage": True}} if stream else {}
+        try:
+            raw = endpoint.client.chat.completions.with_raw_response.create(
+                model=endpoint.model, messages=messages, temperature=self.temperature, **extra
+            )
+        except openai.APIStatusError as e:
+            span["status"] = e.status_code
+            if e.status_code == 429:
+                endpoint.rate_limiter.backoff(parse_retry_after(e.response.headers) or self.retry_delay)
+            raise
+        endpoint.rate_limiter.update_from_headers(raw.headers)
+        response = raw.parse()
+        if stream:
+            text, usage = self._read_stream(response, batch)
+        else:
+            text, usage = response.choices[0].message.content, response.usage
+        if usage is not None:
+            endpoint.rate_limiter.adjust_tokens(usage.total_tokens - estimated)
+            details = getattr(usage, "prompt_tokens_details", None)
+            cached_tokens = getattr(details, "cached_tokens", None) or 0
+            self._count(
+                prompt_tokens=usage.prompt_tokens,
+                completion_tokens=usage.completion_tokens,
+                cached_tokens=cached_tokens,
+            )
+            span.update(
+                prompt_tokens=usage.prompt_tokens,
+                completion_tokens=usage.completion_tokens,
+                cached_tokens=cached_tokens,
+            )
+        return text
+
+    def _read_stream(self, stream, batch: List[SubtitleSegment]) -> Tuple[str, object]:
+        """
+        逐行解析流式回复，实时校验行号。
+        一旦模型偏离格式（未知或重复的行号、缺少分隔符），立即中止并返回已接收的有效行，
+        缺失的行交给补翻逻辑处理。
+        """
+        expected = {seg.line_number for seg in batch}
+        seen = set()
+        accepted = []
+        usage = None
+        buffer = ""
+
+        def accept(line: str) -> bool:
+            line = line.strip()
+            if not line:
+                return True
+            parts = line.split("|", 2)
+            if len(parts) < 3:
+                return False
+            try:
+                line_number = int(parts[0].strip())
+            except ValueError:
+                return False
+            if line_number not in expected or line_number in seen:
+                return False
+            seen.add(line_number)
+            accepted.append(line)
+            return True
+
+        try:
+            for chunk in stream:
+                if getattr(chunk, "usage", None) is not None:
+                    usage = chunk.usage
+                if not chunk.choices:
+                    continue
+                buffer += chunk.choices[0].delta.content or ""
+                while "\n" in buffer:
+                    line, buffer = buffer.split("\n", 1)
+                    if not accept(line):
+                        logger.warning(f"Reply drifted off format, aborting stream: {line[:80]!r}")
+                        self._count(stream_aborts=1)
+                        return "\n".join(accepted), usage
+            if buffer and not accept(buffer):
+                logger.warning(f"Reply drifted off format at the last line: {buffer[:80]!r}")
+        finally:
+            stream.close()
+        return "\n".join(accepted), usage
+
+    def _retry_wait(self, error: Optional[Exception], retries: int, endpoint: Optional[Endpoint] = None) -> float:
+        """
+        重试前的等待时间：优先使用服务端给出的 Retry-After，否则指数退避。
+        出错的接口（error 上记录的接口，或 endpoint）之外还有健康接口时立即重试，下一次请求会被分配到其他接口。
+        """
+        endpoint = getattr(error, "endpoint", None) or endpoint
+        if endpoint is not None and self.endpoints.has_alternative(endpoint):
+            return 0
+        response = getattr(error, "response", None)
+        retry_after = parse_retry_after(getattr(response, "headers", None))
+        if retry_after is not None:
+            return retry_after
+        return self.retry_delay * (2**retries)
+
+    def _run_batch(self, batch: List[SubtitleSegment], history: HistorySnapshot) -> List[SubtitleSegment]:
+        with metrics.span(
+            "batch", "translate", lines=len(batch), first_line=batch[0].line_number, last_line=batch[-1].line_number
+        ):
+            return self._translate_batch(batch, history)
+
+    def _translate_batch(self, batch: List[SubtitleSegment], history: HistorySnapshot) -> List[SubtitleSegment]:
+        """
+        翻译一个批次。回复中缺失的行只补翻缺失部分，不丢弃已解析的行；
+        连续 max_retries 次没有进展时将剩余行二分，分别翻译（最终退化为单行）。
+        返回按批次原顺序排列的译文片段。
+        """
+        translated = {}
+        remaining = batch
+        failures = 0
+        while remaining:
             try:
                 # 只发送行号和文本
-                messages = self._build_messages(batch)
-
-                response = self.client.chat.completions.create(model=self.model, messages=messages, temperature=self.temperature)
-
-                translated_text = response.choices[0].message.content
-                translated_segments = text_to_segments(translated_text, batch)
-
-                # 检查翻译后的分段数量是否匹配
-                if len(translated_segments) != len(batch):
-                    error_msg = f"Translated segments count mismatch: expected {len(batch)}, got {len(translated_segments)}"
-                    logger.error(error_msg)
-                    raise ValueError(error_msg)
-
-                logger.info(
-                    f"Translated batch ending at line {batch[-1].line_number} successfully"
-                )
-
-                # 更新对话历史，记录当前批次的对话对（按行逐条添加）
-                self.orig_segments.extend(batch)
-                self.trans_segments.extend(translated_segments)
-
-                return translated_segments
-
+                messages = self._build_messages(remaining, history)
+                translated_text = self._request(messages, remaining)
+                parsed = text_to_segments(translated_text, remaining)
             except Exception as e:
-                retries += 1
+                failures += 1
                 logger.warning(
-                    f"Retry {retries}/{self.max_retries} for batch ending at line {batch[-1].line_number} due to error: {str(e)}"
+                    f"Retry {failures}/{self.max_retries} for batch ending at line {remaining[-1].line_number} due to error: {str(e)}"
                 )
-                if retries >= self.max_retries:
-                    logger.error("Max retries exceeded for batch translation")
-                    raise Exception("Translation failed after retries") from e
-                time.sleep(self.retry_delay * (2**retries))  # 指数退避
-
-    def _translate_line_by_line(self, batch: list) -> list:
-        """
-        当一次批量翻译的行数不匹配并重试超过 max_retries 时，退化为逐行翻译。
-        """
-        translated_segments = []
-        for segment in batch:
-            retries = 0
-            while retries < self.max_retries:
-                try:
-                    # 每次只翻译一行
-                    segment_list = [segment]
-                    messages = self._build_messages(segment_list)
-
-                    response = self.client.chat.completions.create(model=self.model,
-                    messages=messages,
-                    temperature=self.temperature)
-
-                    translated_text = response.choices[0].message.content
-                    translated_segment = text_to_segments(translated_text, segment_list)
-
-                    if len(translated_segment) != 1:
-                        error_msg = f"Translated single segment count mismatch: expected 1, got {len(translated_segment)}"
-                        logger.error(error_msg)
-                        raise ValueError(error_msg)
-
-                    logger.info(
-                        f"Translated line {segment.line_number} successfully in line-by-line mode"
-                    )
-
-                    # 更新对话历史
-                    self.orig_segments.append(segment)
-                    print(translated_segment)
-                    self.trans_segments.extend(translated_segment)
-
-                    translated_segments.extend(translated_segment)
-                    break  # 成功翻译当前行，退出重试循环
-                except Exception as e:
-                    retries += 1
-                    logger.warning(
-                        f"Retry {retries}/{self.max_retries} for line {segment.line_number} due to error: {str(e)}"
-                    )
-                    if retries >= self.max_retries:
-                        logger.error(
-                            f"Max retries exceeded for line {segment.line_number}"
-                        )
-                        raise Exception(
-                            "Line-by-line translation failed after retries"
-                        ) from e
-                    time.sleep(self.retry_delay * (2**retries))  # 指数退避
-        return translated_segments
+                if failures >= self.max_retries:
+                    break
+                self._count(retries=1)
+                time.sleep(self._retry_wait(e, failures))  # Retry-After 或指数退避
+                continue
+
+            for seg in parsed:
+                translated.setdefault(seg.line_number, seg)
+            missing = [seg for seg in remaining if seg.line_number not in translated]
+            if not missing:
+                break
+
+            if len(missing) < len(remaining):
+                # 部分成功：保留已解析的行，只补翻缺失的行
+                logger.warning(
+                    f"Reply for batch ending at line {remaining[-1].line_number} is missing {len(missing)} lines, requesting them again"
+                )
+                self._count(repair_requests=1)
+            else:
+                failures += 1
+                logger.warning(
+                    f"Retry {failures}/{self.max_retries} for batch ending at line {remaining[-1].line_number}: no valid lines in reply"
+                )
+                if failures >= self.max_retries:
+                    break
+                self._count(retries=1)
+                time.sleep(self._retry_wait(None, failures, getattr(self._local, "endpoint", None)))
+            remaining = missing
+
+        remaining = [seg for seg in remaining if seg.line_number not in translated]
+        if not remaining:
+            logger.info(
+                f"Translated batch ending at line {batch[-1].line_number} successfully"
+            )
+            return [translated[seg.line_number] for seg in batch]
+
+        if len(remaining) == 1:
+            logger.error(f"Max retries exceeded for line {remaining[0].line_number}")
+            raise Exception("Translation failed after retries")
+
+        # 多次失败：二分剩余行，前半部分的译文作为后半部分的上下文
+        logger.warning(
+            f"Splitting {len(remaining)} untranslated lines ending at line {remaining[-1].line_number} into halves"
+        )
+        self._count(bisections=1)
+        middle = len(remaining) // 2
+        first = self._translate_batch(remaining[:middle], history)
+        second_history = (history[0] + remaining[:middle], history[1] + first)
+        second = self._translate_batch(remaining[middle:], second_history)
+        for seg in first + second:
+            translated[seg.line_number] = seg
+        return [translated[seg.line_number] for seg in batch]
@@ -0,0 +1,166 @@
+import re
+import threading
+import time
+from typing import Mapping, Optional
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+_DURATION_PATTERN = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_DURATION_UNITS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+
+
+def parse_duration(value: Optional[str]) -> Optional[float]:
+    """解析 x-ratelimit-reset-* 中的时长（如 "1s"、"6m0s"、"20ms"）或纯秒数"""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    matches = _DURATION_PATTERN.findall(value)
+    if not matches:
+        return None
+    return sum(float(num) * _DURATION_UNITS[unit] for num, unit in matches)
+
+
+def parse_retry_after(headers: Optional[Mapping[str, str]]) -> Optional[float]:
+    """从响应头读取建议的等待时间（秒）"""
+    if not headers:
+        return None
+    retry_after_ms = headers.get("retry-after-ms")
+    if retry_after_ms:
+        try:
+            return float(retry_after_ms) / 1000
+        except ValueError:
+            pass
+    return parse_duration(headers.get("retry-after"))
+
+
+class RateLimiter:
+    """
+    令牌桶限流器：同时限制每分钟请求数 (RPM) 和每分钟 token 数 (TPM)。
+    服务端返回的 x-ratelimit-* 头和 429 的 Retry-After 会同步到桶状态，
+    同一进程内访问同一接口的所有请求共享一个限流器。
+    """
+
+    def __init__(self, requests_per_minute: float = 0, tokens_per_minute: float = 0, min_interval: float = 0):
+        self.requests_per_minute = requests_per_minute or 0
+        self.tokens_per_minute = tokens_per_minute or 0
+        self.min_interval = min_interval or 0
+
+        self._requests = float(self.requests_per_minute)
+        self._tokens = float(self.tokens_per_minute)
+        self._updated = time.monotonic()
+        self._last_request = 0.0
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self._updated
+        self._updated = now
+        if self.requests_per_minute:
+            self._requests = min(
+                self.requests_per_minute, self._requests + elapsed * self.requests_per_minute / 60
+            )
+        if self.tokens_per_minute:
+            self._tokens = min(
+                self.tokens_per_minute, self._tokens + elapsed * self.tokens_per_minute / 60
+            )
+
+    def _wait_time(self, now: float, tokens: float) -> float:
+        wait = max(0.0, self._blocked_until - now)
+        if self.min_interval:
+            wait = max(wait, self._last_request + self.min_interval - now)
+        if self.requests_per_minute and self._requests < 1:
+            wait = max(wait, (1 - self._requests) * 60 / self.requests_per_minute)
+        if self.tokens_per_minute:
+            # 单个请求超过整桶容量时，只要求桶满即可
+            needed = min(tokens, self.tokens_per_minute)
+            if self._tokens < needed:
+                wait = max(wait, (needed - self._tokens) * 60 / self.tokens_per_minute)
+        return wait
+
+    def acquire(self, tokens: float = 0) -> float:
+        """阻塞直到可以发送一个预计消耗 tokens 的请求，返回等待的秒数"""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                wait = self._wait_time(now, tokens)
+                if wait <= 0:
+                    if self.requests_per_minute:
+                        self._requests -= 1
+                    if self.tokens_per_minute:
+                        self._tokens -= tokens
+                    self._last_request = now
+                    return waited
+            time.sleep(wait)
+            waited += wait
+
+    def adjust_tokens(self, delta: float) -> None:
+        """用实际 usage 修正预估：delta 为实际消耗减去预估值"""
+        if not self.tokens_per_minute or not delta:
+            return
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens = min(self.tokens_per_minute, self._tokens - delta)
+
+    def backoff(self, seconds: float) -> None:
+        """暂停所有请求 seconds 秒（429 Retry-After）"""
+        if not seconds or seconds <= 0:
+            return
+        with self._lock:
+            self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+        logger.warning(f"Rate limited, pausing requests for {seconds:.1f}s")
+
+    def blocked_for(self, now: Optional[float] = None) -> float:
+        """距离 Retry-After 暂停结束还有多少秒"""
+        now = time.monotonic() if now is None else now
+        return max(0.0, self._blocked_until - now)
+
+    def update_from_headers(self, headers: Optional[Mapping[str, str]]) -> None:
+        """根据 x-ratelimit-remaining-* / x-ratelimit-reset-* 校正本地桶"""
+        if not headers:
+            return
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            for kind in ("requests", "tokens"):
+                remaining = headers.get(f"x-ratelimit-remaining-{kind}")
+                if remaining is None:
+                    continue
+                try:
+                    remaining = float(remaining)
+                except ValueError:
+                    continue
+                if kind == "requests" and self.requests_per_minute:
+                    self._requests = min(self._requests, remaining)
+                elif kind == "tokens" and self.tokens_per_minute:
+                    self._tokens = min(self._tokens, remaining)
+                if remaining <= 0:
+                    reset = parse_duration(headers.get(f"x-ratelimit-reset-{kind}"))
+                    if reset:
+                        self._blocked_until = max(self._blocked_until, now + reset)
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(
+    key: str,
+    requests_per_minute: float = 0,
+    tokens_per_minute: float = 0,
+    min_interval: float = 0,
+) -> RateLimiter:
+    """获取进程内共享的限流器，同一 key（接口 + 密钥）只创建一次"""
+    with _limiters_lock:
+        limiter = _limiters.get(key)
+        if limiter is None:
+            limiter = RateLimiter(requests_per_minute, tokens_per_minute, min_interval)
+            _limiters[key] = limiter
+        return limiter
@@ -0,0 +1,42 @@
+import threading
+from dataclasses import dataclass, field, fields
+
+
+@dataclass
+class TranslationStats:
+    """翻译请求统计（线程安全的累计计数）"""
+    requests: int = 0          # 发送的请求总数
+    retries: int = 0           # 因错误或回复无效而重试的次数
+    repair_requests: int = 0   # 只补翻缺失行的请求数
+    bisections: int = 0        # 批次多次失败后二分拆分的次数
+    stream_aborts: int = 0     # 流式回复偏离格式而提前中止的次数
+    deduplicated_lines: int = 0   # 复用代表行译文而未发送的重复行数
+    deduplicated_tokens: int = 0  # 去重省下的预估 token 数（输入 + 输出）
+    prompt_tokens: int = 0        # 接口返回的 usage
+    completion_tokens: int = 0
+    cached_tokens: int = 0        # 命中服务端提示词缓存的输入 token
+    _latencies: list = field(default_factory=list, repr=False, compare=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+    def add(self, **counts) -> None:
+        with self._lock:
+            for name, value in counts.items():
+                setattr(self, name, getattr(self, name) + value)
+
+    def record_latency(self, seconds: float) -> None:
+        with self._lock:
+            self._latencies.append(seconds)
+
+    def latency_percentile(self, percent: float) -> float:
+        """请求耗时的百分位数（秒），没有记录时返回 0"""
+        with self._lock:
+            latencies = sorted(self._latencies)
+        if not latencies:
+            return 0.0
+        index = min(len(latencies) - 1, max(0, round(percent / 100 * len(latencies)) - 1))
+        return latencies[index]
+
+    def as_dict(self) -> dict:
+        with self._lock:
+            return {f.name: getattr(self, f.name) for f in fields(self) if not f.name.startswith("_")}
+
@@ -1,6 +1,7 @@
 from pathlib import Path
 import pysubs2
 from models.subtitle import Subtitle
+from utils.subtitle_writer import atomic_write_text, render_subtitles
 from sources.ass.base import ASSource
 
 def write_ass_file(source: ASSource, subtitle: Subtitle, output_path: str) -> bool:
@@ -18,24 +19,9 @@ def write_ass_file(source: ASSource, subtitle: Subtitle, output_path: str) -> bo
     if not source.original_ass:
         return False
     
-    # 创建ASS文件副本
-    translated_ass = source.original_ass
-    
-    # 构建行号到文本的映射
-    translation_map = {
-        seg.line_number: seg.text
-        for seg in subtitle.segments
-    }
-    
-    # 只替换对话文本，保留所有样式和格式
-    event_index = 0
-    for event in translated_ass.events:
-        if event.type == "Dialogue":
-            event_index += 1
-            if event_index in translation_map:
-                event.text = translation_map[event_index]
     try:
-        translated_ass.save(output_path)
+        # 只替换对话文本，保留所有样式和格式
+        atomic_write_text(output_path, render_subtitles(subtitle, ["ass"], source)["ass"])
         return True
     except Exception as e:
         return False
\ No newline at end of file
@@ -0,0 +1,134 @@
+import hashlib
+import os
+import subprocess
+import threading
+from typing import Dict, Optional
+
+from utils.metrics import metrics
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+SAMPLING_RATE = 16000
+# 内容指纹读取的块大小：文件开头、中间和结尾各一块
+_SAMPLE_BYTES = 1 << 20
+
+
+def content_fingerprint(path: str) -> str:
+    """
+    基于内容的指纹：文件大小 + 开头、中间、结尾各 1 MiB 的哈希。
+    文件改名或只更新修改时间不会失效，也不必从慢速存储读取整个容器。
+    """
+    size = os.path.getsize(path)
+    digest = hashlib.blake2b(str(size).encode(), digest_size=16)
+    with open(path, "rb") as f:
+        for offset in sorted({0, max(0, size // 2 - _SAMPLE_BYTES // 2), max(0, size - _SAMPLE_BYTES)}):
+            f.seek(offset)
+            digest.update(f.read(_SAMPLE_BYTES))
+    return digest.hexdigest()
+
+
+class AudioCache:
+    """
+    解码后的音频缓存：用 ffmpeg 把媒体文件的第一条音轨解码为 16 kHz 单声道 float32 PCM，
+    以内容指纹命名保存为原始文件，之后以内存映射的 NumPy 数组读取。
+    更换模型、语言或 beam_size 重新识别时不再解码容器。
+    总大小超过 max_bytes 时按最近使用时间淘汰。
+    """
+
+    SUFFIX = f".{SAMPLING_RATE // 1000}k.f32"
+
+    def __init__(self, directory: str, max_bytes: int = 10 * 1024 ** 3):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._key_locks: Dict[str, threading.Lock] = {}
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key + self.SUFFIX)
+
+    def ensure(self, media_path: str) -> str:
+        """返回媒体文件对应的 PCM 文件路径，不存在时先解码"""
+        key = content_fingerprint(media_path)
+        pcm_path = self._path(key)
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        # 同一文件只解码一次
+        with key_lock:
+            if os.path.exists(pcm_path):
+                # 更新修改时间作为最近使用时间
+                os.utime(pcm_path)
+                metrics.count(audio_cache_hits=1)
+                return pcm_path
+            with metrics.span("decode") as span:
+                self._decode(media_path, pcm_path)
+                span["bytes"] = os.path.getsize(pcm_path)
+            metrics.count(audio_cache_misses=1)
+        self._evict(keep=pcm_path)
+        return pcm_path
+
+    def load(self, media_path: str) -> "numpy.ndarray":
+        """返回内存映射的 float32 音频（写时复制，修改不会写回缓存）"""
+        return self.open(self.ensure(media_path))
+
+    @staticmethod
+    def open(pcm_path: str) -> "numpy.ndarray":
+        import numpy as np
+        if os.path.getsize(pcm_path) == 0:
+            return np.zeros(0, dtype="<f4")
+        return np.memmap(pcm_path, dtype="<f4", mode="c")
+
+    def _decode(self, media_path: str, pcm_path: str) -> None:
+        tmp_path = f"{pcm_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        cmd = [
+            "ffmpeg", "-loglevel", "error", "-nostdin",
+            "-i", str(media_path),
+            "-map", "0:a:0", "-vn", "-sn", "-dn",
+            "-ac", "1", "-ar", str(SAMPLING_RATE),
+            "-f", "f32le", "-acodec", "pcm_f32le",
+            "-y", tmp_path,
+        ]
+        logger.info(f"Decoding audio of {media_path}")
+        try:
+            result = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+            if result.returncode != 0:
+                raise RuntimeError(
+                    f"ffmpeg failed to decode audio: {result.stderr.decode('utf-8', errors='replace').strip()}"
+                )
+            os.replace(tmp_path, pcm_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def _evict(self, keep: Optional[str] = None) -> None:
+        """删除最久未使用的文件，直到总大小不超过 max_bytes（正在使用的文件除外）"""
+        if self.max_bytes <= 0:
+            return
+        entries = []
+        total = 0
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if not entry.name.endswith(self.SUFFIX):
+                    continue
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, entry.path, stat.st_size))
+                total += stat.st_size
+        entries.sort()
+        for _, path, size in entries:
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            try:
+                # 已被内存映射的文件在删除后仍可读取，直到映射关闭
+                os.remove(path)
+                total -= size
+                logger.info(f"Evicted cached audio {os.path.basename(path)}")
+            except OSError:
+                pass
@@ -0,0 +1,155 @@
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class QueuedJob:
+    id: int
+    path: str
+    fingerprint: str
+    attempts: int
+
+
+class JobQueue:
+    """
+    基于 SQLite 的持久化任务队列。
+    同一文件内容（路径 + 指纹）只入队一次；进程崩溃时处于 running 状态的任务在重启后重新排队。
+    失败的任务按指数退避延后重试（retry_delay、2 * retry_delay……，最长 MAX_RETRY_DELAY 秒），
+    达到 max_attempts 次后标记为 failed。
+    """
+
+    MAX_RETRY_DELAY = 3600
+
+    def __init__(self, path: str, max_attempts: int = 3, retry_delay: float = 60):
+        self.path = path
+        self.max_attempts = max(1, int(max_attempts))
+        self.retry_delay = max(0.0, float(retry_delay))
+        self._lock = threading.Lock()
+        self._available = threading.Condition(self._lock)
+
+        if path != ":memory:":
+            directory = os.path.dirname(os.path.abspath(path))
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " path TEXT NOT NULL,"
+            " fingerprint TEXT NOT NULL,"
+            " status TEXT NOT NULL DEFAULT 'pending',"
+            " attempts INTEGER NOT NULL DEFAULT 0,"
+            " error TEXT,"
+            " created REAL NOT NULL,"
+            " updated REAL NOT NULL,"
+            " not_before REAL NOT NULL DEFAULT 0,"
+            " UNIQUE (path, fingerprint))"
+        )
+        # 旧版本创建的队列没有 not_before 列
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+        if "not_before" not in columns:
+            self._conn.execute("ALTER TABLE jobs ADD COLUMN not_before REAL NOT NULL DEFAULT 0")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status, id)")
+        self._conn.commit()
+        self.recover()
+
+    def recover(self) -> int:
+        """将上次运行中断时处于 running 状态的任务重新排队"""
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = 'pending', updated = ? WHERE status = 'running'", (time.time(),)
+            )
+            self._conn.commit()
+        if cursor.rowcount:
+            logger.info(f"Re-queued {cursor.rowcount} interrupted jobs")
+        return cursor.rowcount
+
+    def add(self, path: str, fingerprint: str = "") -> Optional[int]:
+        """入队，返回任务 id；相同路径和指纹的任务已存在时返回 None"""
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT OR IGNORE INTO jobs (path, fingerprint, created, updated) VALUES (?, ?, ?, ?)",
+                (path, fingerprint, now, now),
+            )
+            self._conn.commit()
+            if not cursor.rowcount:
+                return None
+            self._available.notify()
+            return cursor.lastrowid
+
+    def claim(self, timeout: Optional[float] = None) -> Optional[QueuedJob]:
+        """取出最早的已到重试时间的待处理任务并标记为 running；timeout 秒内没有任务时返回 None"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._lock:
+            while True:
+                now = time.time()
+                row = self._conn.execute(
+                    "SELECT id, path, fingerprint, attempts FROM jobs"
+                    " WHERE status = 'pending' AND not_before <= ? ORDER BY id LIMIT 1",
+                    (now,),
+                ).fetchone()
+                if row is not None:
+                    self._conn.execute(
+                        "UPDATE jobs SET status = 'running', attempts = attempts + 1, updated = ? WHERE id = ?",
+                        (time.time(), row[0]),
+                    )
+                    self._conn.commit()
+                    return QueuedJob(id=row[0], path=row[1], fingerprint=row[2], attempts=row[3] + 1)
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return None
+                # 有等待重试的任务时，最迟在其重试时间醒来
+                next_retry = self._conn.execute(
+                    "SELECT MIN(not_before) FROM jobs WHERE status = 'pending'"
+                ).fetchone()[0]
+                if next_retry is not None:
+                    wait = max(0.0, next_retry - now)
+                    remaining = wait if remaining is None else min(remaining, wait)
+                self._available.wait(remaining)
+
+    def complete(self, job_id: int) -> None:
+        self._set_status(job_id, "done", None)
+
+    def fail(self, job_id: int, error: str) -> Optional[float]:
+        """记录失败；未达到最大尝试次数时延后重新排队，返回距重试的秒数，否则返回 None"""
+        with self._lock:
+            row = self._conn.execute("SELECT attempts FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None or row[0] >= self.max_attempts:
+            self._set_status(job_id, "failed", error)
+            return None
+        delay = min(self.retry_delay * 2 ** (row[0] - 1), self.MAX_RETRY_DELAY)
+        self._set_status(job_id, "pending", error, time.time() + delay)
+        return delay
+
+    def _set_status(self, job_id: int, status: str, error: Optional[str], not_before: float = 0) -> None:
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, updated = ?, not_before = ? WHERE id = ?",
+                (status, error, time.time(), not_before, job_id),
+            )
+            self._conn.commit()
+            if status == "pending":
+                self._available.notify()
+
+    def counts(self) -> Dict[str, int]:
+        """各状态的任务数量"""
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return dict(rows)
+
+    def wake_all(self) -> None:
+        """唤醒所有等待中的 claim()（用于退出）"""
+        with self._lock:
+            self._available.notify_all()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
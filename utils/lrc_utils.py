@@ -1,9 +1,5 @@
 from models.subtitle import Subtitle
+from utils.subtitle_writer import atomic_write_text, render_subtitles
 
 def write_lrc_file(subtitle: Subtitle, output_path: str) -> None:
-    with open(output_path, 'w', encoding='utf-8') as f:
-        for seg in subtitle.segments:
-            minutes = int(seg.start // 60)
-            seconds = int(seg.start % 60)
-            milliseconds = int((seg.start - int(seg.start)) * 100)
-            f.write(f"[{minutes:02}:{seconds:02}.{milliseconds:02}]{seg.text}\n")
\ No newline at end of file
+    atomic_write_text(output_path, render_subtitles(subtitle, ["lrc"])["lrc"])
\ No newline at end of file
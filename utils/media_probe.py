@@ -0,0 +1,165 @@
+import atexit
+import json
+import os
+import subprocess
+import threading
+import time
+from dataclasses import dataclass, field, asdict
+from typing import List, Optional
+
+from utils.metrics import metrics
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 图形字幕无法转换为文本字幕
+BITMAP_SUBTITLE_CODECS = {"hdmv_pgs_subtitle", "dvd_subtitle", "dvb_subtitle", "xsub"}
+
+
+@dataclass
+class StreamInfo:
+    index: int
+    codec_type: str
+    codec_name: str = ""
+    language: str = ""
+    title: str = ""
+
+    @property
+    def map_spec(self) -> str:
+        """ffmpeg -map 参数"""
+        return f"0:{self.index}"
+
+    @property
+    def is_text_subtitle(self) -> bool:
+        return self.codec_type == "subtitle" and self.codec_name not in BITMAP_SUBTITLE_CODECS
+
+
+@dataclass
+class MediaInfo:
+    path: str
+    duration: float = 0.0
+    streams: List[StreamInfo] = field(default_factory=list)
+
+    @property
+    def subtitle_streams(self) -> List[StreamInfo]:
+        return [s for s in self.streams if s.codec_type == "subtitle"]
+
+    def find_subtitles(self, languages: List[str], text_only: bool = True) -> List[StreamInfo]:
+        """按语言代码查找字幕流（保持容器内顺序）"""
+        languages = {lang.lower() for lang in languages}
+        return [
+            s for s in self.subtitle_streams
+            if s.language.lower() in languages and (s.is_text_subtitle or not text_only)
+        ]
+
+
+class MediaProbe:
+    """
+    使用 ffprobe 读取媒体流信息，每个文件只执行一次。
+    结果按 (路径, 大小, 修改时间) 缓存，可选持久化为 JSON 文件。
+    """
+
+    # 持久化缓存的最小写入间隔（秒），其余修改在退出时写入
+    SAVE_INTERVAL = 10
+
+    def __init__(self, cache_path: Optional[str] = None):
+        self.cache_path = cache_path
+        self._cache = {}
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._last_save = 0.0
+        if cache_path:
+            if os.path.exists(cache_path):
+                try:
+                    with open(cache_path, "r", encoding="utf-8") as f:
+                        self._cache = json.load(f)
+                except Exception as e:
+                    logger.warning(f"Failed to load probe cache {cache_path}: {e}")
+                    self._cache = {}
+            atexit.register(self.flush)
+
+    @staticmethod
+    def file_key(path: str) -> Optional[str]:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return f"{os.path.abspath(path)}|{stat.st_size}|{stat.st_mtime_ns}"
+
+    def probe(self, path: str) -> Optional[MediaInfo]:
+        """返回文件的流信息，ffprobe 失败时返回 None"""
+        key = self.file_key(path)
+        if key is None:
+            return None
+
+        with self._lock:
+            cached = self._cache.get(key)
+        if cached is None:
+            with metrics.span("probe"):
+                cached = self._run_ffprobe(path)
+            if cached is None:
+                return None
+            with self._lock:
+                self._cache[key] = cached
+                self._dirty = True
+                if time.time() - self._last_save >= self.SAVE_INTERVAL:
+                    self._save()
+
+        return MediaInfo(
+            path=path,
+            duration=cached.get("duration", 0.0),
+            streams=[StreamInfo(**s) for s in cached.get("streams", [])],
+        )
+
+    def _run_ffprobe(self, path: str) -> Optional[dict]:
+        cmd = [
+            "ffprobe",
+            "-v", "error",
+            "-print_format", "json",
+            "-show_streams",
+            "-show_format",
+            str(path),
+        ]
+        try:
+            result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
+            data = json.loads(result.stdout.decode("utf-8", errors="replace") or "{}")
+        except Exception as e:
+            logger.warning(f"ffprobe failed for {path}: {e}")
+            return None
+
+        streams = []
+        for stream in data.get("streams", []):
+            tags = stream.get("tags", {})
+            streams.append(asdict(StreamInfo(
+                index=int(stream.get("index", 0)),
+                codec_type=stream.get("codec_type", ""),
+                codec_name=stream.get("codec_name", ""),
+                language=tags.get("language", tags.get("LANGUAGE", "")),
+                title=tags.get("title", tags.get("TITLE", "")),
+            )))
+        try:
+            duration = float(data.get("format", {}).get("duration", 0.0))
+        except (TypeError, ValueError):
+            duration = 0.0
+        return {"duration": duration, "streams": streams}
+
+    def flush(self) -> None:
+        with self._lock:
+            self._save()
+
+    def _save(self) -> None:
+        """持久化缓存（调用方持有锁）"""
+        if not self.cache_path or not self._dirty:
+            return
+        self._dirty = False
+        self._last_save = time.time()
+        try:
+            directory = os.path.dirname(os.path.abspath(self.cache_path))
+            os.makedirs(directory, exist_ok=True)
+            tmp_path = f"{self.cache_path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self._cache, f, ensure_ascii=False)
+            os.replace(tmp_path, self.cache_path)
+        except Exception as e:
+            logger.warning(f"Failed to save probe cache {self.cache_path}: {e}")
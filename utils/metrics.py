@@ -0,0 +1,256 @@
+import contextvars
+import json
+import os
+import threading
+import time
+from collections import OrderedDict, defaultdict, deque
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Deque, Dict, Iterable, Iterator, Optional
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 当前正在处理的文件；翻译线程池通过 contextvars.copy_context() 继承
+_current_file = contextvars.ContextVar("metrics_current_file", default=None)
+
+
+@dataclass
+class Span:
+    """一段计时区间，start 为相对运行开始的秒数"""
+    name: str
+    category: str
+    file: Optional[str]
+    start: float
+    duration: float
+    thread: str
+    attrs: Dict[str, object] = field(default_factory=dict)
+
+
+class Metrics:
+    """
+    运行指标收集：各阶段的计时区间（span）以及按文件汇总的计数（token、字节、重试）。
+    运行结束后可输出 JSON 报告，或 Chrome trace（chrome://tracing、Perfetto 可直接打开）。
+    各阶段耗时和计数在记录时即累加到汇总中；原始区间只保留最近 max_spans 个，供 Chrome trace 使用，
+    按文件的明细只保留最近处理的 max_files 个文件（更早的文件仍计入全部文件的汇总），
+    因此常驻进程（--watch、--serve）的内存占用和报告耗时不随处理的文件数增长。
+    """
+
+    def __init__(self, max_spans: int = 100000, max_files: int = 1000):
+        self._lock = threading.Lock()
+        self.max_spans = max_spans
+        self.max_files = max_files
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.started_at = time.time()
+            self._origin = time.perf_counter()
+            self.spans: Deque[Span] = deque(maxlen=self.max_spans)
+            self.dropped_spans = 0
+            # 计数：全部文件，以及按文件（键 None 为不属于任何文件的计数）
+            self._totals: Dict[str, int] = defaultdict(int)
+            self.counters: Dict[Optional[str], Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+            # 阶段汇总：全部文件，以及按文件
+            self._stages: Dict[str, dict] = {}
+            self._file_stages: Dict[str, Dict[str, dict]] = defaultdict(dict)
+            self._file_seconds: Dict[str, float] = defaultdict(float)
+            # 最近记录过指标的文件（按最近使用排序），超出 max_files 时丢弃最早文件的明细
+            self._recent_files: "OrderedDict[str, None]" = OrderedDict()
+            self.dropped_files = 0
+
+    @staticmethod
+    def current_file() -> Optional[str]:
+        return _current_file.get()
+
+    @contextmanager
+    def file(self, path: str) -> Iterator[None]:
+        """之后在当前线程（及其复制的上下文）中记录的指标都归属于 path"""
+        token = _current_file.set(path)
+        try:
+            yield
+        finally:
+            _current_file.reset(token)
+
+    @contextmanager
+    def span(self, name: str, category: str = "stage", **attrs) -> Iterator[dict]:
+        """
+        记录一个计时区间。返回的字典可以在区间内追加属性（如 token 数、字节数），
+        区间内抛出的异常会记录为 error 属性后继续抛出。
+        """
+        start = time.perf_counter()
+        try:
+            yield attrs
+        except BaseException as e:
+            attrs["error"] = type(e).__name__
+            raise
+        finally:
+            self.record(name, start, category, **attrs)
+
+    def timed_iter(self, iterable: Iterable, name: str, category: str = "stage", **attrs) -> Iterator:
+        """包装一个（可能阻塞的）迭代器，记录从开始到耗尽的区间以及产出的条目数"""
+        with self.span(name, category, **attrs) as span_attrs:
+            count = 0
+            for item in iterable:
+                count += 1
+                yield item
+            span_attrs["items"] = count
+
+    def record(self, name: str, start: float, category: str = "stage", **attrs) -> None:
+        """记录一个已结束的区间，start 为 time.perf_counter() 的值"""
+        span = Span(
+            name=name,
+            category=category,
+            file=_current_file.get(),
+            start=start - self._origin,
+            duration=time.perf_counter() - start,
+            thread=threading.current_thread().name,
+            attrs=attrs,
+        )
+        with self._lock:
+            if len(self.spans) == self.spans.maxlen:
+                self.dropped_spans += 1
+            self.spans.append(span)
+            self._accumulate(self._stages, span)
+            if span.file:
+                self._touch_file(span.file)
+                self._accumulate(self._file_stages[span.file], span)
+                if span.name == "file":
+                    self._file_seconds[span.file] += span.duration
+
+    def _touch_file(self, path: str) -> None:
+        """标记 path 为最近使用的文件，超出 max_files 时丢弃最早文件的明细（调用方持有锁）"""
+        self._recent_files[path] = None
+        self._recent_files.move_to_end(path)
+        while len(self._recent_files) > self.max_files:
+            oldest, _ = self._recent_files.popitem(last=False)
+            self.counters.pop(oldest, None)
+            self._file_stages.pop(oldest, None)
+            self._file_seconds.pop(oldest, None)
+            self.dropped_files += 1
+
+    @staticmethod
+    def _accumulate(stages: Dict[str, dict], span: Span) -> None:
+        stage = stages.get(span.name)
+        if stage is None:
+            stage = stages[span.name] = {
+                "category": span.category, "count": 0, "seconds": 0.0, "max": 0.0, "errors": 0
+            }
+        stage["count"] += 1
+        stage["seconds"] += span.duration
+        stage["max"] = max(stage["max"], span.duration)
+        if "error" in span.attrs:
+            stage["errors"] += 1
+
+    def count(self, **values) -> None:
+        """为当前文件累加计数"""
+        path = _current_file.get()
+        with self._lock:
+            if path:
+                self._touch_file(path)
+            counters = self.counters[path]
+            for name, value in values.items():
+                counters[name] += value or 0
+                self._totals[name] += value or 0
+
+    def report(self) -> dict:
+        """按文件和阶段汇总耗时与计数"""
+        with self._lock:
+            counters = {path: dict(values) for path, values in self.counters.items()}
+            all_stages = {name: dict(stage) for name, stage in self._stages.items()}
+            file_stages = {
+                path: {name: dict(stage) for name, stage in stages.items()}
+                for path, stages in self._file_stages.items()
+            }
+            file_seconds = dict(self._file_seconds)
+            totals = dict(self._totals)
+            dropped_files = self.dropped_files
+
+        def summarize(stages: Dict[str, dict]) -> Dict[str, dict]:
+            for stage in stages.values():
+                stage["seconds"] = round(stage["seconds"], 3)
+                stage["max"] = round(stage["max"], 3)
+            return stages
+
+        def bottleneck(stages: Dict[str, dict]) -> Optional[str]:
+            # 只比较 stage 类别，不比较外层的文件区间和内层的单个请求
+            candidates = {name: s for name, s in stages.items() if s["category"] == "stage"}
+            return max(candidates, key=lambda name: candidates[name]["seconds"]) if candidates else None
+
+        files = {}
+        for path in sorted(set(file_stages) | {p for p in counters if p}):
+            stages = summarize(file_stages.get(path, {}))
+            files[path] = {
+                "seconds": round(file_seconds.get(path, 0.0), 3),
+                "stages": stages,
+                "bottleneck": bottleneck(stages),
+                "counters": counters.get(path, {}),
+                "prompt_cache_hit_rate": self._prompt_cache_hit_rate(counters.get(path, {})),
+            }
+
+        stages = summarize(all_stages)
+        return {
+            "started_at": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.started_at)),
+            "wall_seconds": round(time.perf_counter() - self._origin, 3),
+            "stages": stages,
+            "bottleneck": bottleneck(stages),
+            "counters": totals,
+            "prompt_cache_hit_rate": self._prompt_cache_hit_rate(totals),
+            "files": files,
+            "dropped_files": dropped_files,
+        }
+
+    @staticmethod
+    def _prompt_cache_hit_rate(counters: dict) -> Optional[float]:
+        """命中服务端提示词缓存的输入 token 比例，没有请求时为 None"""
+        prompt_tokens = counters.get("prompt_tokens", 0)
+        if not prompt_tokens:
+            return None
+        return round(counters.get("cached_tokens", 0) / prompt_tokens, 4)
+
+    def write_report(self, path: str) -> None:
+        self._write_json(path, self.report())
+        logger.info(f"Run report written to {path}")
+
+    def write_chrome_trace(self, path: str) -> None:
+        """输出 Chrome Trace Event 格式（完整事件 "X"，时间单位为微秒）"""
+        with self._lock:
+            spans = list(self.spans)
+            dropped = self.dropped_spans
+        if dropped:
+            logger.info(f"Chrome trace keeps the latest {len(spans)} spans, {dropped} older spans were dropped")
+        thread_ids = {}
+        events = []
+        for span in spans:
+            tid = thread_ids.setdefault(span.thread, len(thread_ids) + 1)
+            args = dict(span.attrs)
+            if span.file:
+                args["file"] = span.file
+            events.append({
+                "name": span.name,
+                "cat": span.category,
+                "ph": "X",
+                "ts": round(span.start * 1e6),
+                "dur": round(span.duration * 1e6),
+                "pid": 1,
+                "tid": tid,
+                "args": args,
+            })
+        for name, tid in thread_ids.items():
+            events.append({"name": "thread_name", "ph": "M", "pid": 1, "tid": tid, "args": {"name": name}})
+        self._write_json(path, {"traceEvents": events, "displayTimeUnit": "ms"})
+        logger.info(f"Chrome trace written to {path}")
+
+    @staticmethod
+    def _write_json(path: str, data: dict) -> None:
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2, default=str)
+        os.replace(tmp_path, path)
+
+
+# 进程内共享的指标收集器
+metrics = Metrics()
@@ -0,0 +1,114 @@
+import os
+import subprocess
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from utils.media_probe import MediaProbe, StreamInfo
+from utils.metrics import metrics
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class SubtitleExtractor:
+    """
+    内嵌字幕提取器：一次 ffmpeg 调用把所有候选文本字幕流转换为 ASS，
+    通过管道直接读入内存，不写临时文件。
+    同一文件的提取结果会被缓存，多个字幕源共享，避免重复解复用。
+    """
+
+    def __init__(self, probe: Optional[MediaProbe] = None, languages: Optional[List[str]] = None, max_cached: int = 4):
+        self.probe = probe or MediaProbe()
+        self.languages = languages or ['en', 'eng']
+        self.max_cached = max_cached
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def candidate_streams(self, path: str) -> List[StreamInfo]:
+        info = self.probe.probe(path)
+        return info.find_subtitles(self.languages) if info else []
+
+    def extract(self, path: str) -> Dict[int, str]:
+        """返回 {流序号: ASS 文本}，按容器内顺序排列；没有候选流时返回空字典"""
+        key = MediaProbe.file_key(path)
+        if key is None:
+            return {}
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return self._cache[key]
+
+        streams = self.candidate_streams(path)
+        with metrics.span("extract", streams=len(streams)) as span:
+            result = self._run_ffmpeg(path, streams) if streams else {}
+            span["bytes"] = sum(len(text.encode("utf-8")) for text in result.values())
+        metrics.count(bytes_read=span["bytes"])
+
+        with self._lock:
+            self._cache[key] = result
+            while len(self._cache) > self.max_cached:
+                self._cache.popitem(last=False)
+        return result
+
+    def _run_ffmpeg(self, path: str, streams: List[StreamInfo]) -> Dict[int, str]:
+        if os.name == 'posix' or len(streams) == 1:
+            return self._extract_single_pass(path, streams)
+        # 非 POSIX 系统无法向子进程传递额外的管道，逐个流通过 stdout 提取
+        result = {}
+        for stream in streams:
+            result.update(self._extract_single_pass(path, [stream]))
+        return result
+
+    def _extract_single_pass(self, path: str, streams: List[StreamInfo]) -> Dict[int, str]:
+        """一次 ffmpeg 调用提取多个字幕流，每个流输出到独立的管道"""
+        cmd = ['ffmpeg', '-loglevel', 'error', '-nostdin', '-i', str(path)]
+        pipes = []
+        if len(streams) == 1:
+            cmd += ['-map', streams[0].map_spec, '-c:s', 'ass', '-f', 'ass', 'pipe:1']
+        else:
+            for stream in streams:
+                read_fd, write_fd = os.pipe()
+                pipes.append((stream, read_fd, write_fd))
+                cmd += ['-map', stream.map_spec, '-c:s', 'ass', '-f', 'ass', f'pipe:{write_fd}']
+
+        outputs = {}
+        readers = []
+        try:
+            process = subprocess.Popen(
+                cmd,
+                stdout=subprocess.PIPE if not pipes else subprocess.DEVNULL,
+                stderr=subprocess.PIPE,
+                pass_fds=[w for _, _, w in pipes],
+            )
+        finally:
+            # 子进程持有写端，父进程必须关闭，否则读端永远等不到 EOF
+            for _, _, write_fd in pipes:
+                os.close(write_fd)
+
+        def read_pipe(stream: StreamInfo, read_fd: int):
+            with os.fdopen(read_fd, 'rb') as f:
+                outputs[stream.index] = f.read()
+
+        for stream, read_fd, _ in pipes:
+            reader = threading.Thread(target=read_pipe, args=(stream, read_fd), daemon=True)
+            reader.start()
+            readers.append(reader)
+
+        stdout, stderr = process.communicate()
+        for reader in readers:
+            reader.join()
+        if not pipes:
+            outputs[streams[0].index] = stdout
+
+        if process.returncode != 0:
+            raise Exception(
+                f"ffmpeg failed to extract subtitles: {stderr.decode('utf-8', errors='replace').strip()}"
+            )
+
+        return {
+            stream.index: outputs.get(stream.index, b'').decode('utf-8', errors='replace')
+            for stream in streams
+            if outputs.get(stream.index)
+        }
@@ -0,0 +1,113 @@
+import codecs
+import re
+from typing import Dict, Iterator, List
+
+from models.subtitle import Subtitle, SubtitleSegment
+
+# 时间行：[时:]分:秒[,.]毫秒 --> ...，结束时间后可以有 WebVTT 的位置设置。
+# 分组：(时:分, 秒, 毫秒) x 2，"时:分" 部分在文件中大量重复，换算结果会被缓存
+_TIMING = re.compile(
+    r"[ \t]*((?:\d+:)?\d{1,2}):(\d{1,2})[,.](\d{1,3})"
+    r"[ \t]*-->[ \t]*((?:\d+:)?\d{1,2}):(\d{1,2})[,.](\d{1,3})"
+)
+
+_BOMS = (
+    (codecs.BOM_UTF8, "utf-8"),
+    (codecs.BOM_UTF16_LE, "utf-16-le"),
+    (codecs.BOM_UTF16_BE, "utf-16-be"),
+)
+
+
+def decode_subtitle_bytes(data: bytes) -> str:
+    """按 BOM 解码（默认 UTF-8），并统一换行符为 \\n"""
+    for bom, encoding in _BOMS:
+        if data.startswith(bom):
+            text = data[len(bom):].decode(encoding, errors="replace")
+            break
+    else:
+        text = data.decode("utf-8", errors="replace")
+    if "\r" in text:
+        text = text.replace("\r\n", "\n").replace("\r", "\n")
+    return text
+
+
+def _minutes_to_seconds(prefix: str, cache: Dict[str, int]) -> int:
+    """把 "时:分" 或 "分" 换算为秒"""
+    parts = prefix.split(":")
+    seconds = int(parts[-1]) * 60 + (int(parts[0]) * 3600 if len(parts) > 1 else 0)
+    cache[prefix] = seconds
+    return seconds
+
+
+def _cue_text(lines: List[str]) -> str:
+    """多行文本用空格连接；去掉没有空行分隔时混入的下一条序号"""
+    if len(lines) == 1:
+        return lines[0]
+    if lines[-1].isdigit():
+        lines = lines[:-1]
+    return " ".join(lines)
+
+
+def iter_cues(text: str) -> Iterator[SubtitleSegment]:
+    """
+    逐条解析 SRT 或 WebVTT 文本，边解析边产出片段。
+    整个缓冲区只切分一次，只有包含 "-->" 的行才交给时间行正则；
+    VTT 的头部、NOTE/STYLE/REGION 块和 cue 标识会被跳过。
+    没有文本的字幕被忽略，行号按有效字幕从 1 开始连续编号。
+    """
+    if text.startswith("\ufeff"):
+        text = text[1:]
+    if "\r" in text:
+        text = text.replace("\r\n", "\n").replace("\r", "\n")
+
+    prefixes: Dict[str, int] = {}
+    line_number = 0
+    start = end = None
+    body: List[str] = []
+
+    for line in text.split("\n"):
+        if "-->" in line:
+            match = _TIMING.match(line)
+            if match is not None:
+                # 上一条字幕与这一条之间缺少空行
+                if start is not None and body:
+                    line_number += 1
+                    yield SubtitleSegment(start, end, _cue_text(body), line_number)
+                prefix1, seconds1, fraction1, prefix2, seconds2, fraction2 = match.groups()
+                base = prefixes.get(prefix1)
+                if base is None:
+                    base = _minutes_to_seconds(prefix1, prefixes)
+                start = base + float(f"{seconds1}.{fraction1}")
+                base = prefixes.get(prefix2)
+                if base is None:
+                    base = _minutes_to_seconds(prefix2, prefixes)
+                end = base + float(f"{seconds2}.{fraction2}")
+                body = []
+                continue
+
+        line = line.strip()
+        if line:
+            if start is not None:
+                body.append(line)
+        elif start is not None:
+            if body:
+                line_number += 1
+                yield SubtitleSegment(start, end, _cue_text(body), line_number)
+            start = None
+            body = []
+
+    if start is not None and body:
+        line_number += 1
+        yield SubtitleSegment(start, end, _cue_text(body), line_number)
+
+
+def parse_subtitle_text(text: str) -> Subtitle:
+    """解析 SRT 或 WebVTT 文本"""
+    return Subtitle(list(iter_cues(text)))
+
+
+def parse_subtitle_file(path: str) -> Subtitle:
+    """一次性读取整个文件后解析，自动处理 BOM 与 CRLF"""
+    with open(path, "rb") as f:
+        data = f.read()
+    return parse_subtitle_text(decode_subtitle_bytes(data))
@@ -0,0 +1,100 @@
+import os
+from typing import Dict, Iterable, List, Optional
+
+import pysubs2
+
+from models.subtitle import Subtitle
+
+import logging
+logger = logging.getLogger(__name__)
+
+OUTPUT_FORMATS = ("srt", "ass", "lrc", "vtt")
+
+
+def _clock(ms: int, separator: str) -> str:
+    """毫秒 -> HH:MM:SS{separator}mmm"""
+    return f"{ms // 3600000:02}:{ms // 60000 % 60:02}:{ms // 1000 % 60:02}{separator}{ms % 1000:03}"
+
+
+def render_subtitles(subtitle: Subtitle, formats: Iterable[str], source=None) -> Dict[str, str]:
+    """
+    遍历一次译文，同时生成多种格式的字幕文本，返回 {格式: 文本}。
+    ASS 字幕源（带 original_ass）的 ASS 输出保留原始样式，只替换对话文本；
+    其他字幕源生成使用默认样式的 ASS。
+    """
+    formats = [fmt.lower().lstrip(".") for fmt in formats]
+    for fmt in formats:
+        if fmt not in OUTPUT_FORMATS:
+            raise ValueError(f"Unsupported output format: {fmt}")
+
+    srt: Optional[List[str]] = [] if "srt" in formats else None
+    vtt: Optional[List[str]] = ["WEBVTT\n\n"] if "vtt" in formats else None
+    lrc: Optional[List[str]] = [] if "lrc" in formats else None
+    original_ass = getattr(source, "original_ass", None) if "ass" in formats else None
+    translation_map: Optional[Dict[int, str]] = {} if original_ass is not None else None
+    ass_events: Optional[List[pysubs2.SSAEvent]] = [] if "ass" in formats and original_ass is None else None
+
+    for index, seg in enumerate(subtitle.segments, 1):
+        text = seg.text
+        start = int(round(seg.start * 1000))
+        end = int(round(seg.end * 1000))
+        if srt is not None:
+            srt.append(f"{index}\n{_clock(start, ',')} --> {_clock(end, ',')}\n{text}\n\n")
+        if vtt is not None:
+            vtt.append(f"{_clock(start, '.')} --> {_clock(end, '.')}\n{text}\n\n")
+        if lrc is not None:
+            lrc.append(f"[{start // 60000:02}:{start // 1000 % 60:02}.{start // 10 % 100:02}]{text}\n")
+        if translation_map is not None:
+            translation_map[seg.line_number] = text
+        elif ass_events is not None:
+            event = pysubs2.SSAEvent(start=start, end=end, name=seg.character)
+            event.plaintext = text
+            ass_events.append(event)
+
+    rendered = {}
+    if srt is not None:
+        rendered["srt"] = "".join(srt)
+    if vtt is not None:
+        rendered["vtt"] = "".join(vtt)
+    if lrc is not None:
+        rendered["lrc"] = "".join(lrc)
+    if translation_map is not None:
+        # 只替换对话文本，保留所有样式和格式
+        event_index = 0
+        for event in original_ass.events:
+            if event.type == "Dialogue":
+                event_index += 1
+                if event_index in translation_map:
+                    event.text = translation_map[event_index]
+        rendered["ass"] = original_ass.to_string("ass")
+    elif ass_events is not None:
+        ass = pysubs2.SSAFile()
+        ass.events = ass_events
+        rendered["ass"] = ass.to_string("ass")
+    # 按请求的顺序返回
+    return {fmt: rendered[fmt] for fmt in formats}
+
+
+def atomic_write_text(path: str, text: str) -> None:
+    """先写入同目录下的临时文件并落盘，再原子地替换目标文件；中途失败不会留下不完整的输出"""
+    tmp_path = f"{path}.tmp"
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def write_subtitles(subtitle: Subtitle, base_path: str, formats: Iterable[str], source=None) -> Dict[str, str]:
+    """一次生成所有格式并逐个原子写入 {base_path}.{格式}，返回 {格式: 路径}"""
+    paths = {}
+    for fmt, text in render_subtitles(subtitle, formats, source).items():
+        path = f"{base_path}.{fmt}"
+        atomic_write_text(path, text)
+        paths[fmt] = path
+    return paths
@@ -17,7 +17,11 @@ def text_to_segments(text: str, original_segments: list[SubtitleSegment]) -> lis
         if not line or "|" not in line:
             continue
         
-        line_num_str, character, content = line.split("|", 2)
+        # 缺少字段的行（如只剩 "行号|角色"）视为未翻译，交给补翻处理
+        parts = line.split("|", 2)
+        if len(parts) < 3:
+            continue
+        line_num_str, character, content = parts
         try:
             line_number = int(line_num_str.strip())
             if line_number in line_map:
@@ -0,0 +1,51 @@
+import re
+from functools import lru_cache
+
+# 每条 chat 消息的固定开销（role、分隔符等）
+MESSAGE_OVERHEAD_TOKENS = 4
+
+# 中日韩文字、假名、全角符号：大约每个字符一个 token
+_CJK_PATTERN = re.compile(
+    r"[\u3000-\u30ff\u31f0-\u31ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uff00-\uffef]"
+)
+
+_encoding = None
+_encoding_loaded = False
+
+
+def _get_encoding():
+    """加载 tiktoken 编码（可选依赖），不可用时返回 None"""
+    global _encoding, _encoding_loaded
+    if not _encoding_loaded:
+        _encoding_loaded = True
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding("o200k_base")
+        except Exception:
+            _encoding = None
+    return _encoding
+
+
+@lru_cache(maxsize=65536)
+def estimate_tokens(text: str) -> int:
+    """
+    估算文本的 token 数。
+    安装了 tiktoken 时使用本地分词器，否则使用按字符类别校准的估算：
+    CJK 字符约 1 token/字，其余字符约 4 字符/token。
+    """
+    if not text:
+        return 0
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text))
+    cjk = len(_CJK_PATTERN.findall(text))
+    other = len(text) - cjk
+    return cjk + (other + 3) // 4
+
+
+def estimate_messages_tokens(messages: list[dict]) -> int:
+    """估算一组 chat 消息的 token 数"""
+    return sum(
+        estimate_tokens(message["content"]) + MESSAGE_OVERHEAD_TOKENS
+        for message in messages
+    )
@@ -0,0 +1,275 @@
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from processor import SubtitleProcessor
+from utils.job_queue import JobQueue
+
+import logging
+logger = logging.getLogger(__name__)
+
+# <sys/inotify.h>
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE_SELF = 0x00000400
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0x00000800
+IN_CLOEXEC = 0x00080000
+_EVENT_HEADER = struct.Struct("iIII")
+
+
+class InotifyBackend:
+    """通过 ctypes 调用 Linux inotify，目录内有文件写入或移入时立即返回"""
+
+    MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_DELETE_SELF
+
+    def __init__(self, directories: Iterable[str], recursive: bool = True):
+        libc_name = ctypes.util.find_library("c") or "libc.so.6"
+        self._libc = ctypes.CDLL(libc_name, use_errno=True)
+        self._fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.recursive = recursive
+        self._watches: Dict[int, str] = {}
+        for directory in directories:
+            self._add_tree(directory)
+
+    def _add_watch(self, directory: str) -> None:
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(directory), self.MASK)
+        if wd < 0:
+            logger.warning(f"Cannot watch {directory}: {os.strerror(ctypes.get_errno())}")
+            return
+        self._watches[wd] = directory
+
+    def _add_tree(self, directory: str) -> None:
+        self._add_watch(directory)
+        if self.recursive:
+            for root, dirs, _ in os.walk(directory):
+                for name in dirs:
+                    self._add_watch(os.path.join(root, name))
+
+    def wait(self, timeout: float) -> Set[str]:
+        """等待最多 timeout 秒，返回有变化的文件路径"""
+        readable, _, _ = select.select([self._fd], [], [], timeout)
+        if not readable:
+            return set()
+        try:
+            data = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return set()
+
+        changed = set()
+        offset = 0
+        while offset + _EVENT_HEADER.size <= len(data):
+            wd, mask, _, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b"\0")
+            offset += length
+            directory = self._watches.get(wd)
+            if directory is None:
+                continue
+            if mask & IN_DELETE_SELF:
+                self._watches.pop(wd, None)
+                continue
+            if not name:
+                continue
+            path = os.path.join(directory, os.fsdecode(name))
+            if mask & IN_ISDIR:
+                # 新建或移入的子目录：加入监视，并检查其中已有的文件
+                if self.recursive and mask & (IN_CREATE | IN_MOVED_TO):
+                    self._add_tree(path)
+                    changed.update(PollingBackend.scan([path], True))
+                continue
+            changed.add(path)
+        return changed
+
+    def close(self) -> None:
+        os.close(self._fd)
+
+
+class PollingBackend:
+    """轮询目录（不支持 inotify 的系统，或网络文件系统）"""
+
+    def __init__(self, directories: Iterable[str], recursive: bool = True, interval: float = 2.0):
+        self.directories = list(directories)
+        self.recursive = recursive
+        self.interval = interval
+
+    @staticmethod
+    def scan(directories: Iterable[str], recursive: bool) -> Set[str]:
+        paths = set()
+        for directory in directories:
+            if recursive:
+                for root, _, files in os.walk(directory):
+                    paths.update(os.path.join(root, name) for name in files)
+            else:
+                with os.scandir(directory) as entries:
+                    paths.update(entry.path for entry in entries if entry.is_file())
+        return paths
+
+    def wait(self, timeout: float) -> Set[str]:
+        time.sleep(min(timeout, self.interval))
+        return self.scan(self.directories, self.recursive)
+
+    def close(self) -> None:
+        pass
+
+
+class Watcher:
+    """
+    监视目录，将写入完成的媒体文件加入持久化队列，并由常驻的 SubtitleProcessor 依次处理。
+    Whisper 模型、OpenAI 客户端、限流器和探测缓存在任务之间保持加载状态。
+    文件大小和修改时间在 settle_seconds 内保持不变才视为写入完成。
+    """
+
+    def __init__(
+        self,
+        processor: SubtitleProcessor,
+        directories: List[str],
+        queue_path: str,
+        extensions: Iterable[str] = (".mkv", ".mp4"),
+        recursive: bool = True,
+        settle_seconds: float = 5,
+        poll_interval: float = 2,
+        workers: int = 1,
+        max_attempts: int = 3,
+        retry_delay: float = 60,
+        use_inotify: bool = True,
+    ):
+        self.processor = processor
+        self.directories = [os.path.abspath(directory) for directory in directories]
+        self.extensions = {ext.lower() for ext in extensions}
+        self.recursive = recursive
+        self.settle_seconds = settle_seconds
+        self.poll_interval = poll_interval
+        self.workers = max(1, int(workers))
+        self.use_inotify = use_inotify
+        self.queue = JobQueue(queue_path, max_attempts, retry_delay)
+
+        # 尚未稳定的文件：路径 -> ((大小, 修改时间), 最近一次变化的时间)
+        self._settling: Dict[str, Tuple[Tuple[int, int], float]] = {}
+        # 已经入队（或已在队列中）的文件状态，轮询时不再重复检测
+        self._known: Dict[str, Tuple[int, int]] = {}
+        self._stop = threading.Event()
+
+    def _create_backend(self):
+        if self.use_inotify and sys.platform.startswith("linux"):
+            try:
+                backend = InotifyBackend(self.directories, self.recursive)
+                logger.info("Watching with inotify")
+                return backend
+            except (OSError, AttributeError) as e:
+                logger.warning(f"inotify unavailable ({e}), falling back to polling")
+        logger.info(f"Watching by polling every {self.poll_interval}s")
+        return PollingBackend(self.directories, self.recursive, self.poll_interval)
+
+    def _is_media(self, path: str) -> bool:
+        return os.path.splitext(path)[1].lower() in self.extensions
+
+    @staticmethod
+    def _file_state(path: str) -> Optional[Tuple[int, int]]:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return stat.st_size, stat.st_mtime_ns
+
+    def _observe(self, paths: Iterable[str]) -> None:
+        """记录文件的最新状态，状态变化时重新开始计时"""
+        now = time.monotonic()
+        for path in paths:
+            if not self._is_media(path):
+                continue
+            state = self._file_state(path)
+            if state is None:
+                self._settling.pop(path, None)
+                self._known.pop(path, None)
+                continue
+            if self._known.get(path) == state:
+                continue
+            previous = self._settling.get(path)
+            if previous is None or previous[0] != state:
+                self._settling[path] = (state, now)
+
+    def _enqueue_settled(self) -> None:
+        """把状态稳定超过 settle_seconds 的文件加入队列"""
+        now = time.monotonic()
+        for path, (state, changed) in list(self._settling.items()):
+            current = self._file_state(path)
+            if current is None:
+                del self._settling[path]
+                continue
+            if current != state:
+                self._settling[path] = (current, now)
+                continue
+            if now - changed < self.settle_seconds:
+                continue
+            del self._settling[path]
+            self._known[path] = state
+            # 指纹为大小和修改时间：同一文件被替换后会再次处理
+            fingerprint = f"{state[0]}:{state[1]}"
+            if self.queue.add(path, fingerprint) is not None:
+                logger.info(f"Queued {path}")
+
+    def _worker(self) -> None:
+        while not self._stop.is_set():
+            job = self.queue.claim(timeout=1)
+            if job is None:
+                continue
+            logger.info(f"Processing queued job {job.id} (attempt {job.attempts}): {job.path}")
+            try:
+                self.processor.process(job.path)
+            except Exception as e:
+                logger.exception(f"Job {job.id} failed: {job.path}")
+                delay = self.queue.fail(job.id, str(e))
+                if delay is None:
+                    logger.error(f"Job {job.id} failed after {job.attempts} attempts, giving up: {job.path}")
+                else:
+                    logger.info(f"Job {job.id} will be retried in {delay:.0f}s")
+                continue
+            self.queue.complete(job.id)
+
+    def run(self) -> None:
+        """阻塞运行，直到 stop() 或 KeyboardInterrupt"""
+        for directory in self.directories:
+            if not os.path.isdir(directory):
+                raise NotADirectoryError(directory)
+
+        backend = self._create_backend()
+        # 启动时已存在的文件（包括停机期间到达的）同样经过稳定检测后入队
+        self._observe(PollingBackend.scan(self.directories, self.recursive))
+
+        threads = [
+            threading.Thread(target=self._worker, name=f"watch-worker-{i}", daemon=True)
+            for i in range(self.workers)
+        ]
+        for thread in threads:
+            thread.start()
+
+        logger.info(f"Watching {', '.join(self.directories)}, queue: {self.queue.counts()}")
+        try:
+            while not self._stop.is_set():
+                # 有文件在等待稳定时缩短等待，以便按时入队
+                timeout = min(1.0, self.settle_seconds) if self._settling else self.poll_interval
+                self._observe(backend.wait(timeout))
+                self._enqueue_settled()
+        except KeyboardInterrupt:
+            logger.info("Stopping watcher")
+        finally:
+            self.stop()
+            backend.close()
+            for thread in threads:
+                thread.join()
+            self.queue.close()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self.queue.wake_all()